@@ -1,2 +1,5 @@
 from AgentBasedModel.agents.agents import ExchangeAgent, Trader, Random, Chartist, Fundamentalist, Universalist,\
-    MarketMaker
+    MarketMaker, Aggregates, EmptyBookError
+from AgentBasedModel.agents.multi import MultiExchangeAgent, PortfolioTrader, PortfolioRandom, PortfolioFundamentalist,\
+    PortfolioChartist
+from AgentBasedModel.agents.population import Population, Member
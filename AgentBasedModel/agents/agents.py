@@ -1,17 +1,30 @@
-from AgentBasedModel.utils import Order, OrderList
+from AgentBasedModel.utils import Order, OrderPool, OrderList, LevelOrderList, CountingOrderList, \
+    CountingLevelOrderList, LiveOrders, TradeTape, RandomStream
 from AgentBasedModel.utils.math import exp, mean
+import numpy as np
 import random
 
 
+class EmptyBookError(Exception):
+    """
+    Raised when market price is requested while bid or ask side of order book is empty
+    """
+    pass
+
+
 class ExchangeAgent:
     """
     ExchangeAgent implements automatic orders handling within the order book. It supports limit orders,
     market orders, cancel orders, returns current spread prices and volumes.
     """
     id = 0
+    books = {'level': LevelOrderList, 'list': OrderList}  # available order book engines
+    counting_books = {LevelOrderList: CountingLevelOrderList, OrderList: CountingOrderList}  # engine -> counting
+    plain_books = {counting: engine for engine, counting in counting_books.items()}
 
     def __init__(self, price: float or int = 100, std: float or int = 25, volume: int = 1000, rf: float = 5e-4,
-                 transaction_cost: float = 0):
+                 transaction_cost: float = 0, book: str = 'level', clearing: str = 'continuous', tape: bool = True,
+                 rng: RandomStream or int = None):
         """
         Initialization parameters
         :param price: stock initial price
@@ -19,16 +32,53 @@ class ExchangeAgent:
         :param volume: number of orders in book
         :param rf: risk-free rate (interest rate for cash holdings of agents)
         :param transaction_cost: cost that is paid on each successful deal
-        """
+        :param book: order book engine, 'level' - indexed price levels, 'list' - linked list (linear insert)
+        :param clearing: 'continuous' - orders are matched on arrival, 'call' - orders are collected and
+            cleared at single price by call auction on clear()
+        :param tape: record every trade in TradeTape
+        :param rng: random stream or its seed, shared by traders, events and simulator of this market
+        """
+        if book not in self.books:
+            raise ValueError(f'Unknown order book engine: {book}, expected one of {list(self.books)}')
+        if clearing not in ('continuous', 'call'):
+            raise ValueError(f'Unknown clearing mode: {clearing}, expected one of [\'continuous\', \'call\']')
         self.name = f'ExchangeAgent{self.id}'
         ExchangeAgent.id += 1
-
-        self.order_book = {'bid': OrderList('bid'), 'ask': OrderList('ask')}
-        self.dividend_book = list()  # list of future dividends
+        self.rng = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+
+        book_cls = self.books[book]
+        self.pool = OrderPool()  # resting orders of both sides
+        self.order_book = {'bid': book_cls('bid', self.pool), 'ask': book_cls('ask', self.pool)}
+        self.tape = TradeTape() if tape else None  # executed trades
+        for order_list in self.order_book.values():
+            order_list.tape = self.tape
+        self._dividend_book = list()  # list of future dividends
+        self.dividend_version = 0  # incremented on every change of dividend book
         self.risk_free = rf
         self.transaction_cost = transaction_cost
+        self.clearing = clearing
+        self.pending = dict()  # order_id -> (Order, is market order), orders waiting for call auction
+
+        # Top-of-book cache, valid while book version is unchanged
+        self._version = -1
+        self._spread = None
+        self._spread_volume = None
+        self._price = None
         self._fill_book(price, std, volume, rf * price)
 
+    @property
+    def dividend_book(self) -> list:
+        """
+        List of future dividends. Assigned book increments dividend_version, book changed in place should
+        increment it too, so that series derived from dividends are recomputed (see SimulatorInfo)
+        """
+        return self._dividend_book
+
+    @dividend_book.setter
+    def dividend_book(self, dividends: list):
+        self._dividend_book = dividends
+        self.dividend_version += 1
+
     def generate_dividend(self):
         """
         Generate time series on future dividends.
@@ -37,23 +87,24 @@ class ExchangeAgent:
         d = self.dividend_book[-1] * self._next_dividend()
         self.dividend_book.append(max(d, 0))  # dividend > 0
         self.dividend_book.pop(0)
+        self.dividend_version += 1
 
     def _fill_book(self, price, std, volume, div: float = 0.05):
         """
         Fill order book with random orders. Fill dividend book with n future dividends.
         """
-        # Order book
-        prices1 = [round(random.normalvariate(price - std, std), 1) for _ in range(volume // 2)]
-        prices2 = [round(random.normalvariate(price + std, std), 1) for _ in range(volume // 2)]
-        quantities = [random.randint(1, 10) for _ in range(volume)]
+        # Order book: prices and quantities are drawn in bulk, book sides are loaded in one pass
+        prices = np.sort(np.round(np.concatenate([
+            self.rng.generator.normal(price - std, std, volume // 2),
+            self.rng.generator.normal(price + std, std, volume // 2)
+        ]), 1))
+        quantities = self.rng.generator.integers(1, 11, prices.size)
+        n_bid = int(np.searchsorted(prices, price, side='right'))  # bid: p <= price, ask: p > price
 
-        for (p, q) in zip(sorted(prices1 + prices2), quantities):
-            if p > price:
-                order = Order(p, q, 'ask', None)
-                self.order_book['ask'].append(order)
-            else:
-                order = Order(p, q, 'bid', None)
-                self.order_book['bid'].push(order)
+        bid = zip(prices[:n_bid][::-1].tolist(), quantities[:n_bid][::-1].tolist())  # best-offer -> worst-offer
+        self.order_book['bid'].load([Order(p, q, 'bid', None) for p, q in bid])
+        ask = zip(prices[n_bid:].tolist(), quantities[n_bid:].tolist())
+        self.order_book['ask'].load([Order(p, q, 'ask', None) for p, q in ask])
 
         # Dividend book
         for i in range(100):
@@ -68,30 +119,76 @@ class ExchangeAgent:
 
         :return: void
         """
-        self.order_book['bid'] = OrderList.from_list([order for order in self.order_book['bid'] if order.qty > 0])
-        self.order_book['ask'] = OrderList.from_list([order for order in self.order_book['ask'] if order.qty > 0])
+        for order_list in self.order_book.values():
+            order_list.prune()
+        self._version = -1
+
+    @property
+    def version(self) -> int:
+        """
+        Book mutation counter, changes whenever either side of order book changes
+        """
+        return self.order_book['bid'].version + self.order_book['ask'].version
+
+    def _cache_top(self, version: int):
+        """
+        Recalculate cached top-of-book values for given book version
+        """
+        bid, ask = self.order_book['bid'].head, self.order_book['ask'].head
+        price, qty = self.pool.price, self.pool.qty
+        self._version = version
+        if bid != -1 and ask != -1:
+            self._spread = {'bid': price[bid], 'ask': price[ask]}
+            self._spread_volume = {'bid': qty[bid], 'ask': qty[ask]}
+            self._price = round((price[bid] + price[ask]) / 2, 1)
+        else:
+            self._spread = None
+            self._spread_volume = None
+            self._price = None
 
     def spread(self) -> dict or None:
         """
+        Cached until book changes, returned dict should not be modified
+
         :return: {'bid': float, 'ask': float}
         """
-        if self.order_book['bid'] and self.order_book['ask']:
-            return {'bid': self.order_book['bid'].first.price, 'ask': self.order_book['ask'].first.price}
-        return None
+        version = self.order_book['bid'].version + self.order_book['ask'].version
+        if version != self._version:
+            self._cache_top(version)
+        return self._spread
 
     def spread_volume(self) -> dict or None:
         """
+        Cached until book changes, returned dict should not be modified
+
         :return: {'bid': float, 'ask': float}
         """
-        if self.order_book['bid'] and self.order_book['ask']:
-            return {'bid': self.order_book['bid'].first.qty, 'ask': self.order_book['ask'].first.qty}
-        return None
+        version = self.order_book['bid'].version + self.order_book['ask'].version
+        if version != self._version:
+            self._cache_top(version)
+        return self._spread_volume
+
+    def depth(self, n_levels: int = 5) -> dict:
+        """
+        Level-2 book snapshot: orders aggregated by price levels from best to worst on each side.
+
+        :param n_levels: number of price levels on each side, all levels if None
+        :return: {'bid': {'price': ndarray, 'qty': ndarray, 'count': ndarray}, 'ask': {...}}
+        """
+        res = dict()
+        for order_type, order_list in self.order_book.items():
+            prices, qtys, counts = order_list.depth(n_levels)
+            res[order_type] = {'price': np.array(prices, dtype=float), 'qty': np.array(qtys, dtype=int),
+                               'count': np.array(counts, dtype=int)}
+        return res
 
     def price(self) -> float or None:
-        spread = self.spread()
-        if spread:
-            return round((spread['bid'] + spread['ask']) / 2, 1)
-        raise Exception(f'Price cannot be determined, since no orders either bid or ask')
+        version = self.order_book['bid'].version + self.order_book['ask'].version
+        if version != self._version:
+            self._cache_top(version)
+        if self._price is not None:
+            return self._price
+        raise EmptyBookError('Price cannot be determined, since no orders either bid or ask')
 
     def dividend(self, access: int = None) -> list or float:
         """
@@ -102,9 +199,8 @@ class ExchangeAgent:
             return self.dividend_book[0]
         return self.dividend_book[:access]
 
-    @classmethod
-    def _next_dividend(cls, std=5e-3):
-        return exp(random.normalvariate(0, std))
+    def _next_dividend(self, std=5e-3):
+        return exp(self.rng.normalvariate(0, std))
 
     def limit_order(self, order: Order):
         """
@@ -112,6 +208,10 @@ class ExchangeAgent:
 
         :return: void
         """
+        if self.clearing == 'call':
+            self.pending[order.order_id] = (order, False)
+            return
+
         bid, ask = self.spread().values()
         t_cost = self.transaction_cost
         if not bid or not ask:
@@ -136,6 +236,10 @@ class ExchangeAgent:
 
         :return: Order
         """
+        if self.clearing == 'call':
+            self.pending[order.order_id] = (order, True)
+            return order
+
         t_cost = self.transaction_cost
         if order.order_type == 'bid':
             order = self.order_book['ask'].fulfill(order, t_cost)
@@ -154,6 +258,169 @@ class ExchangeAgent:
         elif order.order_type == 'ask':
             self.order_book['ask'].remove(order)
 
+    def cancel(self, order_id: int) -> Order or None:
+        """
+        Cancel order from order book by its id, complexity O(1)
+
+        :return: cancelled Order, None if order is not in book (executed or cancelled before)
+        """
+        if order_id in self.pending:
+            return self.pending.pop(order_id)[0]
+        h = self.pool.find(order_id)
+        if h != -1:
+            order = self.pool.view(h)
+            self.order_book[order.order_type].remove(order)
+            return order
+        return None
+
+    def count_operations(self, enabled: bool = True):
+        """
+        Switch counting of order book operations (see counters) on or off. Order lists are replaced in place
+        by their counting classes, order book engines without counting class are not counted.
+        """
+        for order_list in self.order_book.values():
+            plain = self.plain_books.get(type(order_list), type(order_list))
+            order_list.__class__ = self.counting_books.get(plain, plain) if enabled else plain
+
+    def counters(self) -> dict:
+        """
+        Order book operation counters summed over both sides while counting was on (see count_operations)
+
+        :return: {'inserted': int, 'walked': int, 'filled': int, 'cancelled': int}
+        """
+        bid, ask = self.order_book['bid'], self.order_book['ask']
+        return {'inserted': bid.n_inserted + ask.n_inserted, 'walked': bid.n_walked + ask.n_walked,
+                'filled': bid.n_filled + ask.n_filled, 'cancelled': bid.n_cancelled + ask.n_cancelled}
+
+    def _crossing(self, order_type: str, price: float, qty: int) -> list:
+        """
+        Resting orders of order_type with price not worse than price, until their total quantity reaches qty.
+        Book is not crossed, so resting bids only trade with collected asks and vice versa, and not more
+        than collected quantity on the other side.
+
+        :return: list[Order] from best to worst
+        """
+        orders = list()
+        sign = 1 if order_type == 'bid' else -1
+        for order in self.order_book[order_type]:
+            if qty <= 0 or sign * order.price < sign * price:
+                break
+            orders.append(order)
+            qty -= order.qty
+        return orders
+
+    @staticmethod
+    def _auction_price(bid_p: np.ndarray, bid_q: np.ndarray, ask_p: np.ndarray, ask_q: np.ndarray,
+                       ref: float = None) -> tuple:
+        """
+        Find single clearing price maximizing executed volume. Ties are broken by minimal order imbalance,
+        then by closeness to reference price. Market orders have infinite price (bid) or -infinite price (ask).
+
+        :return: (price, volume), (None, 0) if no trade is possible
+        """
+        prices = np.unique(np.concatenate([bid_p[np.isfinite(bid_p)], ask_p[np.isfinite(ask_p)]]))
+        if not prices.size:
+            return None, 0
+
+        # Demand: qty of bids with price >= p, Supply: qty of asks with price <= p
+        idx = np.argsort(bid_p, kind='stable')
+        bid_cum = np.concatenate([[0], np.cumsum(bid_q[idx])])
+        demand = bid_cum[-1] - bid_cum[np.searchsorted(bid_p[idx], prices, side='left')]
+        idx = np.argsort(ask_p, kind='stable')
+        ask_cum = np.concatenate([[0], np.cumsum(ask_q[idx])])
+        supply = ask_cum[np.searchsorted(ask_p[idx], prices, side='right')]
+
+        volume = np.minimum(demand, supply)
+        best = volume.max()
+        if best <= 0:
+            return None, 0
+
+        imbalance = np.abs(demand - supply).astype(float)
+        imbalance[volume < best] = np.inf
+        candidates = prices[imbalance == imbalance.min()]
+        if ref is None:
+            ref = candidates.mean()
+        return float(candidates[np.argmin(np.abs(candidates - ref))]), int(best)
+
+    def clear(self) -> float or None:
+        """
+        Clears orders collected since last call at single uniform price (call auction). Resting orders of
+        the book crossing collected orders take part in the auction with their time priority. Unexecuted
+        limit orders are put into the book, unexecuted market orders are dropped.
+
+        :return: clearing price, None if no trade happened
+        """
+        pending = list(self.pending.values())
+        self.pending.clear()
+        if not pending:
+            return None
+
+        bids = [(order, market) for order, market in pending if order.order_type == 'bid']
+        asks = [(order, market) for order, market in pending if order.order_type == 'ask']
+        spread = self.spread()
+        ref = (spread['bid'] + spread['ask']) / 2 if spread else None
+
+        # Resting orders that can trade with collected ones (market flag is None), they go first as older ones
+        max_bid = max([np.inf if market else order.price for order, market in bids], default=-np.inf)
+        min_ask = min([-np.inf if market else order.price for order, market in asks], default=np.inf)
+        resting_asks = self._crossing('ask', max_bid, sum([order.qty for order, _ in bids]))
+        resting_bids = self._crossing('bid', min_ask, sum([order.qty for order, _ in asks]))
+        bids = [(order, None) for order in resting_bids] + bids
+        asks = [(order, None) for order in resting_asks] + asks
+
+        # Clearing price on vectorized demand and supply curves
+        price, volume = self._auction_price(
+            np.array([np.inf if market else order.price for order, market in bids], dtype=float),
+            np.array([order.qty for order, _ in bids], dtype=float),
+            np.array([-np.inf if market else order.price for order, market in asks], dtype=float),
+            np.array([order.qty for order, _ in asks], dtype=float),
+            ref
+        )
+
+        # Allocate volume by price-time priority and settle
+        t_cost = self.transaction_cost
+        fills = {1: list(), -1: list()}  # sign -> [(trader id, qty executed)] in priority order
+        for orders, sign in ((bids, 1), (asks, -1)):
+            key = [-np.inf if market else -sign * order.price for order, market in orders]
+            remaining = volume
+            for i in sorted(range(len(orders)), key=key.__getitem__):  # stable sort keeps time priority
+                if not remaining:
+                    break
+                order, market = orders[i]
+                qty = min(order.qty, remaining)
+                remaining -= qty
+                if order.trader is not None:
+                    order.trader.cash -= sign * price * qty * (1 + sign * t_cost)
+                    order.trader.assets += sign * qty
+                fills[sign].append((order.trader.id if order.trader is not None else -1, qty))
+                if market is None:
+                    self.order_book[order.order_type].execute(order, qty)
+                else:
+                    order.qty -= qty
+
+        # Record trades pairing buyers and sellers in priority order
+        if self.tape is not None:
+            buy, sell = fills[1], fills[-1]
+            i = j = 0
+            buy_qty, sell_qty = (buy[0][1], sell[0][1]) if volume else (0, 0)
+            while i < len(buy) and j < len(sell):
+                qty = min(buy_qty, sell_qty)
+                self.tape.record(price, qty, 0, sell[j][0], buy[i][0])
+                buy_qty -= qty
+                sell_qty -= qty
+                if not buy_qty:
+                    i += 1
+                    buy_qty = buy[i][1] if i < len(buy) else 0
+                if not sell_qty:
+                    j += 1
+                    sell_qty = sell[j][1] if j < len(sell) else 0
+
+        # Unexecuted limit orders stay in book
+        for order, market in pending:
+            if not market and order.qty > 0:
+                self.order_book[order.order_type].insert(order)
+        return price
+
 
 class Trader:
     id = 0
@@ -172,7 +439,8 @@ class Trader:
         Trader.id += 1
 
         self.market = market
-        self.orders = list()
+        self.rng = market.rng  # random stream of the market
+        self.orders = LiveOrders()  # orders of trader resting in book, kept by order book
 
         self.cash = cash
         self.assets = assets
@@ -181,17 +449,14 @@ class Trader:
         return f'{self.name} ({self.type})'
 
     def equity(self):
-        price = self.market.price() if self.market.price() is not None else 0
-        return self.cash + self.assets * price
+        return self.cash + self.assets * self.market.price()
 
     def _buy_limit(self, quantity, price):
         order = Order(round(price, 1), round(quantity), 'bid', self)
-        self.orders.append(order)
         self.market.limit_order(order)
 
     def _sell_limit(self, quantity, price):
         order = Order(round(price, 1), round(quantity), 'ask', self)
-        self.orders.append(order)
         self.market.limit_order(order)
 
     def _buy_market(self, quantity) -> int:
@@ -213,8 +478,7 @@ class Trader:
         return self.market.market_order(order).qty
 
     def _cancel_order(self, order: Order):
-        self.market.cancel_order(order)
-        self.orders.remove(order)
+        self.market.cancel_order(order)  # order book drops order from orders
 
 
 class Random(Trader):
@@ -226,58 +490,61 @@ class Random(Trader):
         self.type = 'Random'
 
     @staticmethod
-    def draw_delta(std: float or int = 2.5):
+    def draw_delta(std: float or int = 2.5, rng=random):
         lamb = 1 / std
-        return random.expovariate(lamb)
+        return rng.expovariate(lamb)
 
     @staticmethod
-    def draw_price(order_type, spread: dict, std: float or int = 2.5) -> float:
+    def draw_price(order_type, spread: dict, std: float or int = 2.5, rng=random) -> float:
         """
         Draw price for limit order of Noise Agent. The price is calculated as:
         1) 35% - within the spread - uniform distribution
         2) 65% - out of the spread - delta from best price is exponential distribution r.v.
+
+        :param rng: random stream, random module if not given
         """
-        random_state = random.random()  # Determines IN spread OR OUT of spread
+        random_state = rng.random()  # Determines IN spread OR OUT of spread
 
         # Within the spread
         if random_state < .35:
-            return random.uniform(spread['bid'], spread['ask'])
+            return rng.uniform(spread['bid'], spread['ask'])
 
         # Out of spread
         else:
-            delta = Random.draw_delta(std)
+            delta = Random.draw_delta(std, rng)
             if order_type == 'bid':
                 return spread['bid'] - delta
             if order_type == 'ask':
                 return spread['ask'] + delta
 
     @staticmethod
-    def draw_quantity(a=1, b=5) -> float:
+    def draw_quantity(a=1, b=5, rng=random) -> float:
         """
         Draw random quantity to buy from uniform distribution.
 
         :param a: minimal quantity
         :param b: maximal quantity
+        :param rng: random stream, random module if not given
         :return: quantity for order
         """
-        return random.randint(a, b)
+        return rng.randint(a, b)
 
     def call(self):
         spread = self.market.spread()
         if spread is None:
             return
 
-        random_state = random.random()
+        random_state = self.rng.random()
 
         if random_state > .5:
             order_type = 'bid'
         else:
             order_type = 'ask'
 
-        random_state = random.random()
+        random_state = self.rng.random()
         # Market order
         if random_state > .85:
-            quantity = self.draw_quantity()
+            quantity = Random.draw_quantity(rng=self.rng)
             if order_type == 'bid':
                 self._buy_market(quantity)
             elif order_type == 'ask':
@@ -285,8 +552,8 @@ class Random(Trader):
 
         # Limit order
         elif random_state > .5:
-            price = self.draw_price(order_type, spread)
-            quantity = self.draw_quantity()
+            price = Random.draw_price(order_type, spread, rng=self.rng)
+            quantity = Random.draw_quantity(rng=self.rng)
             if order_type == 'bid':
                 self._buy_limit(quantity, price)
             elif order_type == 'ask':
@@ -295,7 +562,7 @@ class Random(Trader):
         # Cancellation order
         elif random_state < .35:
             if self.orders:
-                order_n = random.randint(0, len(self.orders) - 1)
+                order_n = self.rng.randint(0, len(self.orders) - 1)
                 self._cancel_order(self.orders[order_n])
 
 
@@ -335,7 +602,7 @@ class Fundamentalist(Trader):
         return min(q, 5)
 
     def call(self):
-        pf = round(self.evaluate(self.market.dividend(self.access), self.market.risk_free), 1)  # fundamental price
+        pf = round(Fundamentalist.evaluate(self.market.dividend(self.access), self.market.risk_free), 1)  # fundamental
         p = self.market.price()
         spread = self.market.spread()
         t_cost = self.market.transaction_cost
@@ -343,14 +610,14 @@ class Fundamentalist(Trader):
         if spread is None:
             return
 
-        random_state = random.random()
+        random_state = self.rng.random()
         qty = Fundamentalist.draw_quantity(pf, p)  # quantity to buy
         if not qty:
             return
 
         # Limit or Market order
         if random_state > .45:
-            random_state = random.random()
+            random_state = self.rng.random()
 
             ask_t = round(spread['ask'] * (1 + t_cost), 1)
             bid_t = round(spread['bid'] * (1 - t_cost), 1)
@@ -359,24 +626,96 @@ class Fundamentalist(Trader):
                 if random_state > .5:
                     self._buy_market(qty)
                 else:
-                    self._sell_limit(qty, (pf + Random.draw_delta()) * (1 + t_cost))
+                    self._sell_limit(qty, (pf + Random.draw_delta(rng=self.rng)) * (1 + t_cost))
 
             elif pf <= bid_t:
                 if random_state > .5:
                     self._sell_market(qty)
                 else:
-                    self._buy_limit(qty, (pf - Random.draw_delta()) * (1 - t_cost))
+                    self._buy_limit(qty, (pf - Random.draw_delta(rng=self.rng)) * (1 - t_cost))
 
             elif ask_t > pf > bid_t:
                 if random_state > .5:
-                    self._buy_limit(qty, (pf - Random.draw_delta()) * (1 - t_cost))
+                    self._buy_limit(qty, (pf - Random.draw_delta(rng=self.rng)) * (1 - t_cost))
                 else:
-                    self._sell_limit(qty, (pf + Random.draw_delta()) * (1 + t_cost))
+                    self._sell_limit(qty, (pf + Random.draw_delta(rng=self.rng)) * (1 + t_cost))
 
         # Cancel order
         else:
             if self.orders:
-                self._cancel_order(self.orders[0])
+                self._cancel_order(self.orders.oldest())
+
+
+class Aggregates:
+    """
+    Aggregates holds population-wide variables traders use to change sentiment and strategy, computed
+    once per iteration from SimulatorInfo instead of by each trader.
+
+    Counts captured at the beginning of iteration (n_chartists, n_fundamentalists, n_optimistic,
+    n_pessimistic) stay fixed, current counts (live_*) are updated by update() whenever a trader
+    changes type or sentiment.
+    """
+    def __init__(self, info, recount: bool = False):
+        """
+        :param info: SimulatorInfo, captured at current iteration
+        :param recount: count current types and sentiments over traders, otherwise they are taken from
+            captured info (traders have not changed since capture)
+        """
+        self.market = info.exchange
+        self.n_traders = len(info.traders)  # number of all traders
+
+        # Captured counts, taken from arrays of info over traders of economy (first columns), agents added
+        # during simulation are not counted
+        types = info.row('types')[:self.n_traders]
+        chartists = types == info.type_codes['Chartist']
+        sentiments = info.row('sentiments')[:self.n_traders][chartists]
+        self.n_chartists = int(np.count_nonzero(chartists))
+        self.n_fundamentalists = int(np.count_nonzero(types == info.type_codes['Fundamentalist']))
+        self.n_optimistic = int(np.count_nonzero(sentiments == info.sentiment_codes['Optimistic']))
+        self.n_pessimistic = int(np.count_nonzero(sentiments == info.sentiment_codes['Pessimistic']))
+
+        # Current counts
+        self.live_fundamentalists = self.n_fundamentalists
+        self.live_optimistic = self.n_optimistic
+        self.live_pessimistic = self.n_pessimistic
+        if recount:
+            self.live_fundamentalists = self.live_optimistic = self.live_pessimistic = 0
+            for tr in info.traders.values():
+                self.update(None, None, tr.type, getattr(tr, 'sentiment', None))
+
+        self.dp = info.prices[-1] - info.prices[-2] if len(info.prices) > 1 else 0  # price derivative
+        self.price = self.market.price()  # market price
+        self.R = mean(info.row('returns')[:self.n_traders].tolist())  # average return in economy
+        self._fundamental = dict()  # access -> fundamental price
+
+    def fundamental_price(self, access: int) -> float:
+        """
+        :param access: number of future dividends informed
+        :return: fundamental price known to traders with this access
+        """
+        if access not in self._fundamental:
+            self._fundamental[access] = Fundamentalist.evaluate(self.market.dividend(access), self.market.risk_free)
+        return self._fundamental[access]
+
+    def update(self, old_type: str or None, old_sentiment: str or None, new_type: str, new_sentiment: str or None):
+        """
+        Update current counts after trader's type or sentiment changed
+        """
+        if old_type == 'Fundamentalist':
+            self.live_fundamentalists -= 1
+        elif old_type == 'Chartist':
+            if old_sentiment == 'Optimistic':
+                self.live_optimistic -= 1
+            elif old_sentiment == 'Pessimistic':
+                self.live_pessimistic -= 1
+
+        if new_type == 'Fundamentalist':
+            self.live_fundamentalists += 1
+        elif new_type == 'Chartist':
+            if new_sentiment == 'Optimistic':
+                self.live_optimistic += 1
+            elif new_sentiment == 'Pessimistic':
+                self.live_pessimistic += 1
 
 
 class Chartist(Trader):
@@ -394,39 +733,41 @@ class Chartist(Trader):
         """
         super().__init__(market, cash, assets)
         self.type = 'Chartist'
-        self.sentiment = 'Optimistic' if random.random() > .5 else 'Pessimistic'
+        self.sentiment = 'Optimistic' if self.rng.random() > .5 else 'Pessimistic'
 
     def call(self):
         """
         If 'steps' consecutive steps of upward (downward) price movements -> buy (sell) market order. If there are no
         such trend, act as random trader placing only limit orders.
         """
-        random_state = random.random()
+        random_state = self.rng.random()
         t_cost = self.market.transaction_cost
         if self.sentiment == 'Optimistic':
             # Market order
             if random_state > .85:
-                self._buy_market(Random.draw_quantity())
+                self._buy_market(Random.draw_quantity(rng=self.rng))
             # Limit order
             elif random_state > .5:
-                self._buy_limit(Random.draw_quantity(), (self.market.price() - Random.draw_delta()) * (1 - t_cost))
+                quantity = Random.draw_quantity(rng=self.rng)
+                self._buy_limit(quantity, (self.market.price() - Random.draw_delta(rng=self.rng)) * (1 - t_cost))
             # Cancel order
             elif random_state < .35:
                 if self.orders:
-                    self._cancel_order(self.orders[-1])
+                    self._cancel_order(self.orders.newest())
         elif self.sentiment == 'Pessimistic':
             # Market order
             if random_state > .85:
-                self._sell_market(Random.draw_quantity())
+                self._sell_market(Random.draw_quantity(rng=self.rng))
             # Limit order
             elif random_state > .5:
-                self._sell_limit(Random.draw_quantity(), (self.market.price() + Random.draw_delta()) * (1 + t_cost))
+                quantity = Random.draw_quantity(rng=self.rng)
+                self._sell_limit(quantity, (self.market.price() + Random.draw_delta(rng=self.rng)) * (1 + t_cost))
             # Cancel order
             elif random_state < .35:
                 if self.orders:
-                    self._cancel_order(self.orders[-1])
+                    self._cancel_order(self.orders.newest())
 
-    def change_sentiment(self, info, a1=1, a2=1, v1=1):
+    def change_sentiment(self, info, a1=1, a2=1, v1=1, aggregates: Aggregates = None):
         """
         Change sentiment
 
@@ -434,27 +775,33 @@ class Chartist(Trader):
         :param a1: importance of chartists opinion
         :param a2: importance of current price changes
         :param v1: frequency of revaluation of opinion for sentiment
+        :param aggregates: population variables of current iteration, computed from info if None
         """
-        n_traders = len(info.traders)  # number of all traders
-        n_chartists = sum([tr_type == 'Chartist' for tr_type in info.types[-1].values()])
-        n_optimistic = sum([tr_type == 'Optimistic' for tr_type in info.sentiments[-1].values()])
-        n_pessimists = sum([tr_type == 'Pessimistic' for tr_type in info.sentiments[-1].values()])
+        if aggregates is None:
+            aggregates = Aggregates(info, recount=True)
+        n_traders = aggregates.n_traders  # number of all traders
+        n_chartists = aggregates.n_chartists
+        n_optimistic = aggregates.n_optimistic
+        n_pessimists = aggregates.n_pessimistic
 
-        dp = info.prices[-1] - info.prices[-2] if len(info.prices) > 1 else 0  # price derivative
-        p = self.market.price()  # market price
+        dp = aggregates.dp  # price derivative
+        p = aggregates.price  # market price
         x = (n_optimistic - n_pessimists) / n_chartists
 
         U = a1 * x + a2 / v1 * dp / p
+        sentiment = self.sentiment
         if self.sentiment == 'Optimistic':
             prob = v1 * n_chartists / n_traders * exp(U)
-            if prob > random.random():
+            if prob > self.rng.random():
                 self.sentiment = 'Pessimistic'
 
         elif self.sentiment == 'Pessimistic':
             prob = v1 * n_chartists / n_traders * exp(-U)
-            if prob > random.random():
+            if prob > self.rng.random():
                 self.sentiment = 'Optimistic'
 
+        if self.sentiment != sentiment:
+            aggregates.update(self.type, sentiment, self.type, self.sentiment)
         # print('sentiment', prob)
 
 
@@ -471,8 +818,8 @@ class Universalist(Fundamentalist, Chartist):
         :param access: number of future dividends informed
         """
         super().__init__(market, cash, assets)
-        self.type = 'Chartist' if random.random() > .5 else 'Fundamentalist'  # randomly decide type
-        self.sentiment = 'Optimistic' if random.random() > .5 else 'Pessimistic'  # sentiment about trend (Chartist)
+        self.type = 'Chartist' if self.rng.random() > .5 else 'Fundamentalist'  # randomly decide type
+        self.sentiment = 'Optimistic' if self.rng.random() > .5 else 'Pessimistic'  # sentiment about trend (Chartist)
         self.access = access  # next n dividend payments known (Fundamentalist)
 
     def call(self):
@@ -484,7 +831,7 @@ class Universalist(Fundamentalist, Chartist):
         elif self.type == 'Fundamentalist':
             Fundamentalist.call(self)
 
-    def change_strategy(self, info, a1=1, a2=1, a3=1, v1=.1, v2=.1, s=.1):
+    def change_strategy(self, info, a1=1, a2=1, a3=1, v1=.1, v2=.1, s=.1, aggregates: Aggregates = None):
         """
         Change strategy or sentiment
 
@@ -495,22 +842,27 @@ class Universalist(Fundamentalist, Chartist):
         :param v1: frequency of revaluation of opinion for sentiment
         :param v2: frequency of revaluation of opinion for strategy
         :param s: importance of fundamental value opportunities
+        :param aggregates: population variables of current iteration, computed from info if None
         """
+        if aggregates is None:
+            aggregates = Aggregates(info, recount=True)
+
         # Gather variables
-        n_traders = len(info.traders)  # number of all traders
-        n_fundamentalists = sum([tr.type == 'Fundamentalist' for tr in info.traders.values()])
-        n_optimistic = sum([tr.sentiment == 'Optimistic' for tr in info.traders.values() if tr.type == 'Chartist'])
-        n_pessimists = sum([tr.sentiment == 'Pessimistic' for tr in info.traders.values() if tr.type == 'Chartist'])
-
-        dp = info.prices[-1] - info.prices[-2] if len(info.prices) > 1 else 0  # price derivative
-        p = self.market.price()  # market price
-        pf = self.evaluate(self.market.dividend(self.access), self.market.risk_free)  # fundamental price
+        n_traders = aggregates.n_traders  # number of all traders
+        n_fundamentalists = aggregates.live_fundamentalists
+        n_optimistic = aggregates.live_optimistic
+        n_pessimists = aggregates.live_pessimistic
+
+        dp = aggregates.dp  # price derivative
+        p = aggregates.price  # market price
+        pf = aggregates.fundamental_price(self.access)  # fundamental price
         r = pf * self.market.risk_free  # expected dividend return
-        R = mean(info.returns[-1].values())  # average return in economy
+        R = aggregates.R  # average return in economy
 
         # Change sentiment
         if self.type == 'Chartist':
-            Chartist.change_sentiment(self, info, a1, a2, v1)
+            Chartist.change_sentiment(self, info, a1, a2, v1, aggregates)
+        tr_type, sentiment = self.type, self.sentiment
 
         # Change strategy
         U1 = a3 * ((r + 1 / v2 * dp) / p - R - s * abs((pf - p) / p))
@@ -519,24 +871,27 @@ class Universalist(Fundamentalist, Chartist):
         if self.type == 'Chartist':
             if self.sentiment == 'Optimistic':
                 prob = v2 * n_optimistic / n_traders * exp(U1)
-                if prob > random.random():
+                if prob > self.rng.random():
                     self.type = 'Fundamentalist'
             elif self.sentiment == 'Pessimistic':
                 prob = v2 * n_pessimists / n_traders * exp(U2)
-                if prob > random.random():
+                if prob > self.rng.random():
                     self.type = 'Fundamentalist'
 
         elif self.type == 'Fundamentalist':
             prob = v2 * n_fundamentalists / n_traders * exp(-U1)
-            if prob > random.random() and self.sentiment == 'Pessimistic':
+            if prob > self.rng.random() and self.sentiment == 'Pessimistic':
                 self.type = 'Chartist'
                 self.sentiment = 'Optimistic'
 
             prob = v2 * n_fundamentalists / n_traders * exp(-U2)
-            if prob > random.random() and self.sentiment == 'Optimistic':
+            if prob > self.rng.random() and self.sentiment == 'Optimistic':
                 self.type = 'Chartist'
                 self.sentiment = 'Pessimistic'
 
+        if self.type != tr_type or self.sentiment != sentiment:
+            aggregates.update(tr_type, sentiment, self.type, self.sentiment)
+
 
 class MarketMaker(Trader):
     """
@@ -554,8 +909,8 @@ class MarketMaker(Trader):
 
     def call(self):
         # Clear previous orders
-        for order in self.orders.copy():
-            self._cancel_order(order)
+        for order in list(self.orders):
+            self.market.cancel_order(order)
 
         spread = self.market.spread()
         price = self.market.price()
@@ -0,0 +1,230 @@
+from AgentBasedModel.agents.agents import ExchangeAgent, Trader, Random, Fundamentalist, Chartist
+from AgentBasedModel.utils import Order, LiveOrders, RandomStream
+from AgentBasedModel.utils.math import exp
+import numpy as np
+
+
+class MultiExchangeAgent:
+    """
+    MultiExchangeAgent lists several instruments. Each instrument (symbol) has its own order book and dividend
+    process, held by ExchangeAgent of the symbol. Orders are routed to the instrument by symbol index.
+    Dividend shocks of instruments are correlated through common factor.
+    """
+    def __init__(self, symbols: list or int = 10, price: float or list = 100, std: float or int = 25,
+                 volume: int = 1000, rf: float = 5e-4, transaction_cost: float = 0, correlation: float = 0,
+                 book: str = 'level', rng: RandomStream or int = None):
+        """
+        Initialization parameters
+        :param symbols: list of instrument names or number of instruments
+        :param price: initial price of all instruments, or list of initial prices for each one
+        :param std: standard deviation of order prices in books
+        :param volume: number of orders in each book
+        :param rf: risk-free rate (interest rate for cash holdings of agents)
+        :param transaction_cost: cost that is paid on each successful deal
+        :param correlation: correlation of dividend shocks among instruments
+        :param book: order book engine of instruments, see ExchangeAgent
+        :param rng: random stream or its seed, shared by all instruments
+        """
+        if isinstance(symbols, int):
+            symbols = [f'S{i}' for i in range(symbols)]
+        prices = price if isinstance(price, (list, tuple, np.ndarray)) else [price] * len(symbols)
+
+        self.rng = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}  # symbol -> instrument index
+        self.markets = [ExchangeAgent(p, std, volume, rf, transaction_cost, book, rng=self.rng)
+                        for p in prices]
+        self.risk_free = rf
+        self.correlation = correlation
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+    def __getitem__(self, symbol: str) -> ExchangeAgent:
+        return self.markets[self.index[symbol]]
+
+    def prices(self) -> np.ndarray:
+        """
+        :return: market price of each instrument
+        """
+        return np.array([market.price() for market in self.markets])
+
+    def dividends(self) -> np.ndarray:
+        """
+        :return: current dividend of each instrument
+        """
+        return np.array([market.dividend_book[0] for market in self.markets])
+
+    def generate_dividend(self, std=5e-3):
+        """
+        Generate next dividend of each instrument, shocks are drawn at once for all instruments:
+        z = sqrt(c) * common + sqrt(1 - c) * idiosyncratic
+        """
+        c = self.correlation
+        z = c**.5 * self.rng.normal() + (1 - c)**.5 * self.rng.generator.standard_normal(len(self.markets))
+        for market, shock in zip(self.markets, np.exp(std * z).tolist()):
+            market.dividend_book.append(max(market.dividend_book[-1] * shock, 0))  # dividend > 0
+            market.dividend_book.pop(0)
+            market.dividend_version += 1
+
+    def limit_order(self, k: int, order: Order):
+        self.markets[k].limit_order(order)
+
+    def market_order(self, k: int, order: Order) -> Order:
+        return self.markets[k].market_order(order)
+
+    def cancel(self, k: int, order_id: int) -> Order or None:
+        return self.markets[k].cancel(order_id)
+
+
+class Account(Trader):
+    """
+    Account is a view of PortfolioTrader in one instrument that behaves as single market Trader: its market is
+    exchange of the instrument, cash is cash of the portfolio and assets are position in the instrument.
+    Strategies of single market traders act on account, and orders are linked to it, so that settlement of
+    trades updates cash and position of the portfolio.
+    """
+    def __init__(self, trader, k: int):
+        # Trader.__init__ is not called: account shares id, cash and random stream of the portfolio
+        self.trader = trader
+        self.k = k  # instrument index
+        self.id = trader.id
+        self.name = trader.name
+        self.market = trader.market.markets[k]
+        self.rng = trader.rng
+        self.orders = LiveOrders()  # orders resting in book of instrument
+
+    @property
+    def type(self) -> str:
+        return self.trader.type
+
+    @property
+    def sentiment(self) -> str:
+        return self.trader.sentiment
+
+    @property
+    def access(self) -> int:
+        return self.trader.access
+
+    @property
+    def cash(self) -> float:
+        return self.trader.cash
+
+    @cash.setter
+    def cash(self, value: float):
+        self.trader.cash = value
+
+    @property
+    def assets(self) -> int:
+        return self.trader.positions[self.k]
+
+    @assets.setter
+    def assets(self, value: int):
+        self.trader.positions[self.k] = value
+
+
+class PortfolioTrader:
+    """
+    PortfolioTrader holds cash and vector of positions in instruments of MultiExchangeAgent. On each call
+    it acts in one randomly chosen instrument through Account of the instrument.
+    """
+    def __init__(self, market: MultiExchangeAgent, cash: float or int, assets: int or list = 0):
+        """
+        :param market: link to multi-instrument exchange agent
+        :param cash: trader's cash available
+        :param assets: number of shares hold in each instrument, or list of them
+        """
+        self.type = 'Unknown'
+        self.name = f'Trader{Trader.id}'
+        self.id = Trader.id  # ids are shared with single instrument traders
+        Trader.id += 1
+
+        self.market = market
+        self.rng = market.rng  # random stream of the market
+        self.cash = cash
+        self.positions = np.zeros(len(market), dtype=int) + np.asarray(assets, dtype=int)
+        self.accounts = [Account(self, k) for k in range(len(market))]
+        self.orders = [account.orders for account in self.accounts]  # instrument -> orders resting in book
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.type})'
+
+    def equity(self, prices: np.ndarray = None) -> float:
+        """
+        :param prices: market prices of instruments, requested from exchange if None
+        """
+        if prices is None:
+            prices = self.market.prices()
+        return self.cash + float(self.positions @ prices)
+
+    def _draw_account(self) -> Account:
+        return self.accounts[self.rng.randrange(len(self.positions))]
+
+
+class PortfolioRandom(PortfolioTrader):
+    """
+    PortfolioRandom creates noisy orders in randomly chosen instrument, as Random does in single market.
+    """
+    def __init__(self, market: MultiExchangeAgent, cash: float or int, assets: int or list = 0):
+        super().__init__(market, cash, assets)
+        self.type = 'Random'
+
+    def call(self):
+        Random.call(self._draw_account())
+
+
+class PortfolioFundamentalist(PortfolioTrader):
+    """
+    PortfolioFundamentalist evaluates randomly chosen instrument with its known future dividends and
+    trades it as Fundamentalist does in single market.
+    """
+    def __init__(self, market: MultiExchangeAgent, cash: float or int, assets: int or list = 0, access: int = 1):
+        """
+        :param access: number of future dividends informed
+        """
+        super().__init__(market, cash, assets)
+        self.type = 'Fundamentalist'
+        self.access = access
+
+    def call(self):
+        Fundamentalist.call(self._draw_account())
+
+
+class PortfolioChartist(PortfolioTrader):
+    """
+    PortfolioChartist has one sentiment for the whole market. Sentiment is revaluated on opinion of other
+    chartists and average price change of all instruments, so price moves of some instruments spread
+    to the others.
+    """
+    def __init__(self, market: MultiExchangeAgent, cash: float or int, assets: int or list = 0):
+        super().__init__(market, cash, assets)
+        self.type = 'Chartist'
+        self.sentiment = 'Optimistic' if self.rng.random() > .5 else 'Pessimistic'
+
+    def call(self):
+        Chartist.call(self._draw_account())
+
+    def change_sentiment(self, info, a1=1, a2=1, v1=1):
+        """
+        Change sentiment
+
+        :param info: MultiSimulatorInfo
+        :param a1: importance of chartists opinion
+        :param a2: importance of current price changes
+        :param v1: frequency of revaluation of opinion for sentiment
+        """
+        n_traders = len(info.traders)  # number of all traders
+        n_chartists = info.n_chartists
+        x = (info.n_optimistic - info.n_pessimistic) / n_chartists
+        dp = info.market_return()  # average relative price change of all instruments
+
+        U = a1 * x + a2 / v1 * dp
+        if self.sentiment == 'Optimistic':
+            prob = v1 * n_chartists / n_traders * exp(U)
+            if prob > self.rng.random():
+                self.sentiment = 'Pessimistic'
+
+        elif self.sentiment == 'Pessimistic':
+            prob = v1 * n_chartists / n_traders * exp(-U)
+            if prob > self.rng.random():
+                self.sentiment = 'Optimistic'
@@ -0,0 +1,345 @@
+from AgentBasedModel.agents.agents import ExchangeAgent, Trader, Fundamentalist, Aggregates
+from AgentBasedModel.utils import Order, LiveOrders
+import numpy as np
+
+
+class Member:
+    """
+    Member is a trader-like view of one agent of Population. It is linked to agent's orders, so that
+    settlement of trades updates population arrays, and can be captured by SimulatorInfo as any Trader.
+    """
+    __slots__ = ('population', 'i', 'id')
+
+    def __init__(self, population, i: int, trader_id: int):
+        self.population = population
+        self.i = i  # index in population arrays
+        self.id = trader_id
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.type})'
+
+    @property
+    def name(self) -> str:
+        return f'Trader{self.id}'
+
+    @property
+    def cash(self) -> float:
+        return float(self.population.cash[self.i])
+
+    @cash.setter
+    def cash(self, value: float):
+        self.population.cash[self.i] = value
+
+    @property
+    def assets(self) -> int:
+        return int(self.population.assets[self.i])
+
+    @assets.setter
+    def assets(self, value: int):
+        self.population.assets[self.i] = value
+
+    @property
+    def type(self) -> str:
+        return Population.types[self.population.type[self.i]]
+
+    @property
+    def sentiment(self) -> str or None:
+        return Population.sentiments.get(self.population.sentiment[self.i])
+
+    @property
+    def access(self) -> int:
+        return int(self.population.access[self.i])
+
+    @property
+    def orders(self) -> LiveOrders:
+        return self.population.orders[self.i]
+
+    def equity(self) -> float:
+        return float(self.population.cash[self.i] + self.population.assets[self.i] * self.population.market.price())
+
+    def call(self):
+        self.population.act(self.i)
+
+
+class Population:
+    """
+    Population stores state of homogeneous Random, Fundamentalist, Chartist and Universalist agents in
+    NumPy arrays: cash, assets, class, current type, sentiment, information access. Random decisions of
+    all agents for an iteration are drawn at once by draw(), then each agent (Member) submits its orders
+    on call, so that members are shuffled with other traders. Strategy and sentiment changes are
+    computed for all agents at once by change().
+
+    Single agent classes (Random, Fundamentalist, Chartist, Universalist) are the reference implementation
+    of strategies. Unlike them, agents change strategy and sentiment simultaneously, given population
+    counts at the beginning of iteration.
+    """
+    classes = ('Random', 'Fundamentalist', 'Chartist', 'Universalist')
+    types = ('Random', 'Fundamentalist', 'Chartist')  # current strategy
+    sentiments = {1: 'Optimistic', -1: 'Pessimistic'}
+
+    def __init__(self, market: ExchangeAgent, n_random: int = 0, n_fundamentalist: int = 0, n_chartist: int = 0,
+                 n_universalist: int = 0, cash: float or int = 10**3, assets: int = 0, access: int = 1):
+        """
+        :param market: link to exchange agent
+        :param n_random: number of Random agents
+        :param n_fundamentalist: number of Fundamentalist agents
+        :param n_chartist: number of Chartist agents
+        :param n_universalist: number of Universalist agents
+        :param cash: each agent's cash available
+        :param assets: each agent's number of shares hold
+        :param access: number of future dividends informed (Fundamentalist, Universalist)
+        """
+        self.market = market
+        self.rng = market.rng  # random stream of the market
+        sizes = (n_random, n_fundamentalist, n_chartist, n_universalist)
+        n = sum(sizes)
+
+        self.kind = np.repeat(np.arange(4, dtype=np.int8), sizes)  # agent class, index of classes
+        self.cash = np.full(n, cash, dtype=float)
+        self.assets = np.full(n, assets, dtype=int)
+        self.access = np.full(n, access, dtype=int)
+
+        # Universalist decides type randomly, then sentiment is drawn for all (used by Chartist types)
+        universal = self.kind == 3
+        self.type = np.where(universal, 0, self.kind).astype(np.int8)
+        self.type[universal] = np.where(self.rng.generator.random(universal.sum()) > .5, 2, 1)
+        self.sentiment = np.where(self.rng.generator.random(n) > .5, 1, -1).astype(np.int8)
+        self.sentiment[self.kind <= 1] = 0
+
+        self.members = [Member(self, i, Trader.id + i) for i in range(n)]
+        Trader.id += n
+        self.orders = [LiveOrders() for _ in range(n)]  # agent -> orders resting in book
+        self._decisions = None
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def draw(self):
+        """
+        Draw random decisions of all agents for current iteration.
+        """
+        n = len(self)
+        generator = self.rng.generator
+        self._decisions = (
+            generator.random(n).tolist(),  # order side (Random), order or cancel choice
+            generator.random(n).tolist(),  # order kind
+            generator.random(n).tolist(),  # in or out of spread (Random), market or limit (Fundamentalist)
+            generator.random(n).tolist(),  # price within spread, order to cancel
+            generator.exponential(2.5, n).tolist(),  # price delta from best price
+            generator.integers(1, 6, n).tolist()  # quantity (Random, Chartist)
+        )
+
+    def draw_one(self) -> tuple:
+        """
+        Draw random decisions of one agent, in the same order as draw()
+        """
+        rng = self.rng
+        return rng.random(), rng.random(), rng.random(), rng.random(), 2.5 * rng.exponential(), rng.randint(1, 5)
+
+    def act(self, i: int, decisions: tuple = None):
+        """
+        Submit orders of agent i given decisions drawn for current iteration.
+
+        :param i: agent index
+        :param decisions: decisions of agent (see draw_one), taken from draw() if None
+        """
+        if decisions is None:
+            decisions = [d[i] for d in self._decisions]
+        t = self.type[i]
+        if t == 0:
+            self._act_random(i, decisions)
+        elif t == 1:
+            self._act_fundamentalist(i, decisions)
+        else:
+            self._act_chartist(i, decisions)
+
+    def _limit(self, i: int, order_type: str, quantity, price):
+        order = Order(round(price, 1), round(quantity), order_type, self.members[i])
+        self.market.limit_order(order)
+
+    def _market(self, i: int, order_type: str, quantity):
+        other = self.market.order_book['ask' if order_type == 'bid' else 'bid']
+        if other:
+            self.market.market_order(Order(other.last.price, round(quantity), order_type, self.members[i]))
+
+    def _cancel(self, i: int, order: Order):
+        self.market.cancel_order(order)  # order book drops order from orders of agent
+
+    def _act_random(self, i: int, decisions: tuple):
+        spread = self.market.spread()
+        if spread is None:
+            return
+        u_side, u_kind, u_spread, u_price, delta, qty = decisions
+        order_type = 'bid' if u_side > .5 else 'ask'
+
+        # Market order
+        if u_kind > .85:
+            self._market(i, order_type, qty)
+
+        # Limit order: 35% within the spread, 65% out of spread
+        elif u_kind > .5:
+            if u_spread < .35:
+                price = spread['bid'] + u_price * (spread['ask'] - spread['bid'])
+            elif order_type == 'bid':
+                price = spread['bid'] - delta
+            else:
+                price = spread['ask'] + delta
+            self._limit(i, order_type, qty, price)
+
+        # Cancellation order
+        elif u_kind < .35:
+            orders = self.orders[i]
+            if orders:
+                self._cancel(i, orders[int(u_price * len(orders))])
+
+    def _act_fundamentalist(self, i: int, decisions: tuple):
+        market = self.market
+        spread = market.spread()
+        if spread is None:
+            return
+        u_trade, _, u_market, _, delta, _ = decisions
+        pf = round(Fundamentalist.evaluate(market.dividend(int(self.access[i])), market.risk_free), 1)
+        qty = Fundamentalist.draw_quantity(pf, market.price())
+        t_cost = market.transaction_cost
+        if not qty:
+            return
+
+        # Limit or Market order
+        if u_trade > .45:
+            ask_t = round(spread['ask'] * (1 + t_cost), 1)
+            bid_t = round(spread['bid'] * (1 - t_cost), 1)
+
+            if pf >= ask_t:
+                if u_market > .5:
+                    self._market(i, 'bid', qty)
+                else:
+                    self._limit(i, 'ask', qty, (pf + delta) * (1 + t_cost))
+
+            elif pf <= bid_t:
+                if u_market > .5:
+                    self._market(i, 'ask', qty)
+                else:
+                    self._limit(i, 'bid', qty, (pf - delta) * (1 - t_cost))
+
+            elif ask_t > pf > bid_t:
+                if u_market > .5:
+                    self._limit(i, 'bid', qty, (pf - delta) * (1 - t_cost))
+                else:
+                    self._limit(i, 'ask', qty, (pf + delta) * (1 + t_cost))
+
+        # Cancel order
+        elif self.orders[i]:
+            self._cancel(i, self.orders[i].oldest())
+
+    def _act_chartist(self, i: int, decisions: tuple):
+        _, u_kind, _, _, delta, qty = decisions
+        t_cost = self.market.transaction_cost
+        order_type = 'bid' if self.sentiment[i] == 1 else 'ask'
+
+        # Market order
+        if u_kind > .85:
+            self._market(i, order_type, qty)
+        # Limit order
+        elif u_kind > .5:
+            if order_type == 'bid':
+                self._limit(i, 'bid', qty, (self.market.price() - delta) * (1 - t_cost))
+            else:
+                self._limit(i, 'ask', qty, (self.market.price() + delta) * (1 + t_cost))
+        # Cancel order
+        elif u_kind < .35:
+            if self.orders[i]:
+                self._cancel(i, self.orders[i].newest())
+
+    def change(self, info, a1=1, a2=1, a3=1, v1=.1, v2=.1, s=.1, chartist_v1=1, aggregates: Aggregates = None):
+        """
+        Change sentiment of Chartists and strategy or sentiment of Universalists for all agents at once,
+        see Chartist.change_sentiment and Universalist.change_strategy.
+
+        :param info: SimulatorInfo
+        :param a1: importance of chartists opinion
+        :param a2: importance of current price changes
+        :param a3: importance of fundamentalist profit
+        :param v1: frequency of revaluation of opinion for sentiment (Universalist)
+        :param v2: frequency of revaluation of opinion for strategy (Universalist)
+        :param s: importance of fundamental value opportunities
+        :param chartist_v1: frequency of revaluation of opinion for sentiment (Chartist)
+        :param aggregates: population variables of current iteration, computed from info if None
+        """
+        if aggregates is None:
+            aggregates = Aggregates(info)
+        counts = self._counts()
+        self._change(aggregates, a1, a2, a3, v1, v2, s, chartist_v1)
+
+        # Current counts of aggregates follow changes of members, as Aggregates.update does for traders
+        fundamentalists, optimistic, pessimistic = (new - old for new, old in zip(self._counts(), counts))
+        aggregates.live_fundamentalists += fundamentalists
+        aggregates.live_optimistic += optimistic
+        aggregates.live_pessimistic += pessimistic
+
+    def _counts(self) -> tuple:
+        """
+        :return: number of fundamentalists, optimistic and pessimistic chartists among members
+        """
+        chartist = self.type == 2
+        return (int(np.count_nonzero(self.type == 1)), int(np.count_nonzero(chartist & (self.sentiment == 1))),
+                int(np.count_nonzero(chartist & (self.sentiment == -1))))
+
+    def _change(self, aggregates: Aggregates, a1, a2, a3, v1, v2, s, chartist_v1):
+        n_traders = aggregates.n_traders
+        n_chartists = aggregates.n_chartists
+        n_fundamentalists = aggregates.n_fundamentalists
+        n_optimistic = aggregates.n_optimistic
+        n_pessimists = aggregates.n_pessimistic
+        if not n_chartists:
+            n_chartists = 1  # no sentiment change is possible without chartists, avoid division by zero
+
+        dp = aggregates.dp  # price derivative
+        p = aggregates.price  # market price
+        x = (n_optimistic - n_pessimists) / n_chartists
+        n = len(self)
+
+        # Change sentiment of chartists
+        chartist = self.type == 2
+        v = np.where(self.kind == 3, v1, chartist_v1)
+        U = a1 * x + a2 / v * dp / p
+        prob = v * n_chartists / n_traders * np.exp(U * self.sentiment)
+        flip = chartist & (prob > self.rng.generator.random(n))
+        self.sentiment[flip] *= -1
+
+        # Change strategy of universalists
+        universal = self.kind == 3
+        if not universal.any():
+            return
+        pf = np.zeros(n)
+        for access in np.unique(self.access[universal]).tolist():
+            pf[self.access == access] = aggregates.fundamental_price(access)
+        r = pf * self.market.risk_free  # expected dividend return
+        R = aggregates.R  # average return in economy
+        U1 = a3 * ((r + 1 / v2 * dp) / p - R - s * np.abs((pf - p) / p))
+        U2 = a3 * (R - (r + 1 / v2 * dp) / p - s * np.abs((pf - p) / p))
+
+        u1, u2 = self.rng.generator.random((2, n))
+        chartist &= universal
+        fundamentalist = universal & (self.type == 1)
+        optimistic, pessimistic = self.sentiment == 1, self.sentiment == -1
+
+        # Chartist -> Fundamentalist
+        prob = np.where(optimistic, v2 * n_optimistic / n_traders * np.exp(U1),
+                        v2 * n_pessimists / n_traders * np.exp(U2))
+        to_fundamentalist = chartist & (prob > u1)
+
+        # Fundamentalist -> Chartist, pessimistic ones become optimistic and vice versa
+        flip1 = fundamentalist & pessimistic & (v2 * n_fundamentalists / n_traders * np.exp(-U1) > u1)
+        flip2 = fundamentalist & (optimistic | flip1) & (v2 * n_fundamentalists / n_traders * np.exp(-U2) > u2)
+
+        self.type[to_fundamentalist] = 1
+        self.type[flip1 | flip2] = 2
+        self.sentiment[flip1] = 1
+        self.sentiment[flip2] = -1
+
+    def pay(self, dividend: float, risk_free: float):
+        """
+        Dividend and interest payments to all agents.
+        """
+        self.cash += self.assets * dividend  # allow negative dividends
+        self.cash += self.cash * risk_free  # allow risk-free loan
@@ -1,2 +1,2 @@
 from AgentBasedModel.events.events import FundamentalPriceShock, MarketPriceShock, InformationShock,\
-    MarketMakerIn, MarketMakerOut, TransactionCost
+    MarketMakerIn, MarketMakerOut, TransactionCost, Event, Condition, PriceAbove, PriceBelow, Drawdown
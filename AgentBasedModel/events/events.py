@@ -4,21 +4,115 @@ from AgentBasedModel.utils.orders import Order
 
 
 class Event:
+    """
+    Event is activated once at iteration it. It can be made recurring by repeat() or conditional by when(),
+    conditions are evaluated by EventScheduler of simulator.
+    """
     def __init__(self, it: int):
         self.it = it  # Activation it
+        self.every = None  # period of recurring event
+        self.until = None  # last iteration of recurring or conditional event
+        self.condition = None  # condition of conditional event
+        self.triggered = None  # last iteration condition was met, set by EventScheduler
         self.simulator = None
 
     def call(self, it: int):
         if self.simulator is None:
             raise Exception('No simulator link found')
-        if it != self.it:
+        if not self.due(it):
             return True
 
+    def due(self, it: int) -> bool:
+        """
+        :return: True if event is activated at iteration it
+        """
+        if it < self.it or (self.until is not None and it > self.until):
+            return False
+        if self.condition is not None:
+            return self.triggered == it
+        if self.every is not None:
+            return (it - self.it) % self.every == 0
+        return it == self.it
+
+    def repeat(self, every: int, until: int = None):
+        """
+        Activate event every n iterations starting from it
+
+        :param every: period in iterations
+        :param until: last iteration event can be activated
+        :return: self
+        """
+        if self.condition is not None:
+            raise ValueError('Event cannot be both recurring and conditional')
+        if every < 1:
+            raise ValueError(f'Period of recurring event must be positive, got {every}')
+        self.every = every
+        self.until = until
+        return self
+
+    def when(self, condition, until: int = None):
+        """
+        Activate event each time condition becomes true, starting from it
+
+        :param condition: Condition evaluated on market state
+        :param until: last iteration event can be activated
+        :return: self
+        """
+        if self.every is not None:
+            raise ValueError('Event cannot be both recurring and conditional')
+        self.condition = condition
+        self.until = until
+        return self
+
     def link(self, simulator: Simulator):
         self.simulator = simulator
         return self
 
 
+class Condition:
+    """
+    Condition of conditional event, evaluated on MarketState once per iteration
+    """
+    def __call__(self, state) -> bool:
+        raise NotImplementedError
+
+
+class PriceAbove(Condition):
+    def __init__(self, price: float):
+        self.price = price
+
+    def __repr__(self):
+        return f'price > {self.price}'
+
+    def __call__(self, state) -> bool:
+        return state.price > self.price
+
+
+class PriceBelow(Condition):
+    def __init__(self, price: float):
+        self.price = price
+
+    def __repr__(self):
+        return f'price < {self.price}'
+
+    def __call__(self, state) -> bool:
+        return state.price < self.price
+
+
+class Drawdown(Condition):
+    def __init__(self, drawdown: float):
+        """
+        :param drawdown: relative fall of price from its running maximum, e.g. 0.1 for 10%
+        """
+        self.drawdown = drawdown
+
+    def __repr__(self):
+        return f'drawdown >= {self.drawdown}'
+
+    def __call__(self, state) -> bool:
+        return state.drawdown >= self.drawdown
+
+
 class FundamentalPriceShock(Event):
     def __init__(self, it: int, price_change: float):
         super().__init__(it)
@@ -70,6 +164,8 @@ class InformationShock(Event):
         for trader in self.simulator.traders:
             if type(trader) in (Universalist, Fundamentalist):
                 trader.access = self.access
+        if self.simulator.population is not None:
+            self.simulator.population.access[:] = self.access
 
 
 class MarketMakerIn(Event):
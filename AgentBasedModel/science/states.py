@@ -43,7 +43,7 @@ def trend(info: SimulatorInfo, category: bool = False, size: int = None, rolling
             return 'bear'
         return 'stationary'
 
-    prices = math.rolling(info.prices, rolling)
+    prices = info.rolling_mean('prices', rolling)
     if size is None:
         res = test_trend(prices)['tau']
         return res if not category else cat(res)
@@ -75,8 +75,8 @@ def efficiency(info: SimulatorInfo, category: bool = False, size: int = None, ro
             return 'inefficient'
         return 'efficient'
 
-    market = math.rolling(info.prices, rolling)
-    fundamental = math.rolling(info.fundamental_value(access), rolling)
+    market = info.rolling_mean('prices', rolling)
+    fundamental = info.rolling_mean('fundamental_value', rolling, access)
     rel_d = [abs(market[i] - fundamental[i]) / fundamental[i] for i in range(len(market))]
 
     if size is None:
@@ -1 +1,8 @@
-from AgentBasedModel.simulator.simulator import Simulator, SimulatorInfo
+from AgentBasedModel.simulator.simulator import Simulator, SimulatorInfo, Termination
+from AgentBasedModel.simulator.scheduler import EventScheduler, MarketState
+from AgentBasedModel.simulator.profiler import Profiler
+from AgentBasedModel.simulator.metrics import OnlineMetrics, RollingStats
+from AgentBasedModel.simulator.multi import MultiSimulator, MultiSimulatorInfo
+from AgentBasedModel.simulator.ensemble import Ensemble
+from AgentBasedModel.simulator.continuous import ContinuousSimulator
+from AgentBasedModel.simulator.storage import InfoSink, StoredInfo, ChunkedSeries
@@ -0,0 +1,123 @@
+from AgentBasedModel.agents import ExchangeAgent, Universalist, Chartist, Population, Member, Aggregates
+from AgentBasedModel.simulator.simulator import Simulator
+from AgentBasedModel.simulator.profiler import Profiler
+from AgentBasedModel.simulator.metrics import OnlineMetrics
+from heapq import heapify, heappush, heappop
+
+
+class ContinuousSimulator(Simulator):
+    """
+    ContinuousSimulator is event-driven: each agent wakes up at times of its own Poisson process with rate
+    of its class, agents act in order of wake-up times kept in priority queue. Time is measured in
+    iterations: events, info capture, payments and dividends happen at integer times (iteration
+    boundaries), agents act between them. Cost of iteration is proportional to number of actions, not
+    to number of agents, apart from per-iteration bookkeeping (capture, aggregates).
+
+    Chartists and Universalists revise sentiment and strategy when they wake up, using aggregates of
+    current iteration. Population changes strategies of all members at iteration boundary, each member
+    draws its decisions when it wakes up.
+    """
+    def __init__(self, exchange: ExchangeAgent = None, traders: list = None, events: list = None,
+                 population: Population = None, rates: dict = None, max_spread: float = None,
+                 min_cash: float = None, profiler: Profiler = None, profile: str = 'full', stride: int = 1,
+                 sink=None, metrics: OnlineMetrics = None):
+        """
+        :param exchange: exchange agent
+        :param traders: list of traders
+        :param events: list of events (scenario)
+        :param population: agents stored in arrays, their members act along with traders
+        :param rates: class name -> mean number of actions of agent per iteration, 1 for classes not listed,
+            0 - agents of class never act
+        :param max_spread: stop if (ask - bid) / price exceeds it, not checked if None
+        :param min_cash: stop if cash of any trader falls below it, not checked if None
+        :param profiler: records phase times and order book operations, not profiled if None
+        :param profile: capture profile of info, 'minimal', 'market' or 'full', see SimulatorInfo
+        :param stride: per-agent series of info are recorded every stride iterations
+        :param sink: InfoSink history of info is streamed to, kept in memory if None
+        :param metrics: metrics of info computed during simulation, see OnlineMetrics
+        """
+        super().__init__(exchange, traders, events, population, max_spread, min_cash, profiler, profile, stride,
+                         sink, metrics)
+        self.rates = rates if rates is not None else dict()
+        self.clock = 0  # time of last action
+        self._queue = list()  # (wake-up time, sequence number, agent, rate)
+        self._active = dict()  # trader id -> sequence number, agents in queue
+        self._n = 0  # number of agents scheduled
+        self._traders = None  # traders list queue was synchronized with
+        self._n_traders = 0
+
+        if population is not None:
+            rates = [self.rates.get(Population.classes[kind], 1) for kind in population.kind.tolist()]
+            self._schedule(population.members, rates)
+        self._sync()
+
+    def _schedule(self, agents: list, rates: list):
+        """
+        Draw first wake-up times of agents from current iteration
+
+        :return: void
+        """
+        items = list()
+        for agent, rate in zip(agents, rates):
+            seq = self._n
+            self._n += 1
+            if rate <= 0:
+                continue
+            self._active[agent.id] = seq
+            items.append((self.iteration + self.rng.expovariate(rate), seq, agent, rate))
+        self._queue.extend(items)
+        heapify(self._queue)
+
+    def _sync(self):
+        """
+        Synchronize queue with traders list, events may add or remove traders
+
+        :return: void
+        """
+        if self.traders is self._traders and len(self.traders) == self._n_traders:
+            return
+        members = {member.id for member in self.population.members} if self.population is not None else set()
+        current = {trader.id for trader in self.traders} | members
+        self._active = {t_id: seq for t_id, seq in self._active.items() if t_id in current}
+        new = [trader for trader in self.traders if trader.id not in self._active]
+        self._schedule(new, [self.rates.get(type(trader).__name__, 1) for trader in new])
+        self._traders = self.traders
+        self._n_traders = len(self.traders)
+
+    def _wake(self, agent, aggregates: Aggregates):
+        if type(agent) == Member:
+            self.population.act(agent.i, self.population.draw_one())
+            return
+        if type(agent) == Universalist:
+            agent.change_strategy(self.info, aggregates=aggregates)
+        elif type(agent) == Chartist:
+            agent.change_sentiment(self.info, aggregates=aggregates)
+        agent.call()
+
+    def _behaviour(self) -> Aggregates or None:
+        """
+        Change strategies of population at iteration boundary, chartists and universalists change when they
+        wake up
+
+        :return: population variables of iteration, None if no agent changes behaviour
+        """
+        aggregates = Aggregates(self.info) if self._changing() else None  # population variables
+        if self.population is not None:
+            self.population.change(self.info, aggregates=aggregates)  # updates current counts read on wake-up
+        return aggregates
+
+    def _activate(self, it: int, aggregates: Aggregates or None):
+        """
+        Agents act in order of wake-up times from it to it + 1
+
+        :param it: iteration
+        :param aggregates: population variables of iteration
+        """
+        queue, active, end = self._queue, self._active, it + 1
+        while queue and queue[0][0] < end:
+            time, seq, agent, rate = heappop(queue)
+            if active.get(agent.id) != seq:
+                continue  # agent was removed
+            self.clock = time
+            self._wake(agent, aggregates)
+            heappush(queue, (time + self.rng.expovariate(rate), seq, agent, rate))
@@ -0,0 +1,124 @@
+from AgentBasedModel.simulator.profiler import Profiler
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import random
+from tqdm import tqdm
+
+
+def _replicate(scenario, reducer, n_iter: int, seed: np.random.SeedSequence, retries: int = 0,
+               profile: bool = False) -> tuple:
+    """
+    Run one replication in worker process, only reduced result is sent back. Replication stopped early
+    is replaced by a new one with child seed, at most retries times.
+
+    :return: (result, list of Termination of stopped runs, Profiler of all runs or None)
+    """
+    terminations = list()
+    profiler = Profiler() if profile else None
+    for attempt in range(retries + 1):
+        state = seed.generate_state(4)
+        random.seed(int.from_bytes(state.tobytes(), 'little'))
+        np.random.seed(state)
+        simulator = scenario()
+        simulator.profiler = profiler
+        simulator.simulate(n_iter, silent=True)
+        if simulator.info.termination is None:
+            break
+        terminations.append(simulator.info.termination)
+        seed = seed.spawn(1)[0]
+    return reducer(simulator.info), terminations, profiler
+
+
+class Ensemble:
+    """
+    Ensemble runs independent replications of the same scenario in parallel processes. Each replication
+    builds Simulator by scenario factory, simulates it and reduces SimulatorInfo to a result by reducer
+    within the worker, so that histories never cross process boundaries.
+
+    Replication i is seeded by i-th child of seed sequence (random and numpy.random global states),
+    results do not depend on number of workers or on the order replications finish.
+
+    Scenario and reducer are sent to workers, so they have to be picklable: module level functions or
+    functools.partial of them, not lambdas.
+
+    Replications stopped early (see Termination) are replaced by new runs up to retries times, their
+    terminations are collected in self.terminations. If all runs of replication stop early, result is
+    reduced from the last one (partial history).
+
+    If profile is set, each replication is profiled and profilers are merged into self.profiler.
+    """
+    def __init__(self, scenario, reducer, n_iter: int = 500, seed: int = None, workers: int = None,
+                 retries: int = 0, profile: bool = False):
+        """
+        :param scenario: function with no arguments returning Simulator
+        :param reducer: function of SimulatorInfo returning result of replication
+        :param n_iter: number of iterations simulated in each replication
+        :param seed: seed of ensemble, drawn from OS entropy if None (see self.seed)
+        :param workers: number of worker processes, all CPUs if None, 1 runs in current process
+        :param retries: number of times replication stopped early is replaced by a new run
+        :param profile: profile replications, see self.profiler
+        """
+        self.scenario = scenario
+        self.reducer = reducer
+        self.n_iter = n_iter
+        self.seed = np.random.SeedSequence(seed).entropy  # reproduces ensemble if passed as seed
+        self.workers = workers
+        self.retries = retries
+        self.terminations = dict()  # replication index -> list of Termination of stopped runs
+        self.profile = profile
+        self.profiler = Profiler() if profile else None  # phase times and counters of all replications
+
+    def _seeds(self, n: int) -> list:
+        return np.random.SeedSequence(self.seed).spawn(n)
+
+    def _collect(self, i: int, output: tuple):
+        """
+        Store terminations and profiler of replication i
+
+        :return: result of replication
+        """
+        result, terminations, profiler = output
+        if terminations:
+            self.terminations[i] = terminations
+        if profiler is not None:
+            self.profiler.merge(profiler)
+        return result
+
+    def stream(self, n: int):
+        """
+        Run n replications and yield results as they finish
+
+        :param n: number of replications
+        :return: generator of (replication index, result)
+        """
+        seeds = self._seeds(n)
+        if self.workers == 1:
+            for i, seed in enumerate(seeds):
+                yield i, self._collect(i, _replicate(self.scenario, self.reducer, self.n_iter, seed, self.retries,
+                                                     self.profile))
+            return
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            futures = {executor.submit(_replicate, self.scenario, self.reducer, self.n_iter, seed, self.retries,
+                                       self.profile): i
+                       for i, seed in enumerate(seeds)}
+            try:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    yield i, self._collect(i, future.result())
+            finally:
+                for future in futures:
+                    future.cancel()  # generator closed early or replication failed
+
+    def run(self, n: int, silent: bool = False) -> list:
+        """
+        Run n replications
+
+        :param n: number of replications
+        :param silent: disable progress bar
+        :return: results in order of replications
+        """
+        results = [None] * n
+        for i, result in tqdm(self.stream(n), total=n, desc='Ensemble', disable=silent):
+            results[i] = result
+        return results
@@ -0,0 +1,166 @@
+from AgentBasedModel.agents import ExchangeAgent, Fundamentalist
+from sys import float_info
+
+
+class RollingStats:
+    """
+    RollingStats holds mean and variance of the last window values pushed, or of all values if window
+    is None. Values of window are kept in ring buffer, statistics are updated by Welford's algorithm in
+    O(1) per value and recomputed from buffer once every window values, so that rounding errors do not
+    accumulate over long runs.
+    """
+    def __init__(self, window: int = None):
+        """
+        :param window: number of last values, all values if None
+        """
+        self.window = window
+        self.buffer = [0.0] * window if window is not None else None  # ring buffer of window
+        self.head = 0  # index of oldest value in buffer
+        self.n = 0  # number of values
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from mean
+        self._replaced = 0  # values replaced since statistics were recomputed
+
+    def full(self) -> bool:
+        return self.n == self.window
+
+    def push(self, x: float):
+        """
+        Add value, the oldest value leaves full window
+        """
+        if self.window is None or self.n < self.window:
+            if self.window is not None:
+                self.buffer[self.n] = x
+            self.n += 1
+            d = x - self.mean
+            self.mean += d / self.n
+            self.m2 += d * (x - self.mean)
+            return
+
+        old = self.buffer[self.head]
+        self.buffer[self.head] = x
+        self.head = (self.head + 1) % self.window
+        self._replaced += 1
+        if self._replaced == self.window:
+            self._exact()
+            return
+        mean = self.mean + (x - old) / self.n
+        self.m2 += (x - old) * (x - mean + old - self.mean)
+        self.mean = mean
+
+    def _exact(self):
+        """
+        Recompute statistics of window from buffer (two-pass)
+        """
+        self.mean = sum(self.buffer) / self.n
+        self.m2 = sum([(x - self.mean)**2 for x in self.buffer])
+        self._replaced = 0
+
+    def std(self) -> float:
+        if self.window is not None and self.m2 <= self.n * self.window * float_info.epsilon * self.mean**2:
+            return 0.0  # deviations are within rounding error of replacements, values of window are equal
+        return (max(self.m2, 0) / self.n)**.5
+
+
+class OnlineMetrics:
+    """
+    OnlineMetrics computes market metrics of SimulatorInfo during simulation: rolling price and return
+    volatility, Sharpe ratio and arbitrage for chosen windows (and information accesses), and the same
+    metrics over whole run. It is updated by SimulatorInfo.capture() in O(1) per window per iteration,
+    SimulatorInfo returns its values instead of recomputing them from history for tracked windows.
+
+    Windows have semantics of SimulatorInfo methods: value i is statistic of iterations i..i+window-1,
+    and is available once iteration i+window is captured.
+    """
+    def __init__(self, windows: list = None, accesses: list = None):
+        """
+        :param windows: window sizes of rolling metrics, metrics over whole run are always computed
+        :param accesses: numbers of future dividends fundamental value of arbitrage is evaluated with,
+            [1] if None
+        """
+        self.windows = list(windows) if windows is not None else list()
+        self.accesses = list(accesses) if accesses is not None else [1]
+        for window in self.windows:
+            if window < 1:
+                raise ValueError(f'Window must be positive, got {window}')
+        for access in self.accesses:
+            if access < 1:
+                raise ValueError(f'Access must be positive, got {access}')
+
+        keys = [None] + self.windows
+        self.risk_free = None  # risk-free rate at last update
+        self.n_iter = 0  # number of iterations updated
+        self._prices = {w: RollingStats(w) for w in keys}
+        self._returns = {w: RollingStats(w) for w in keys}
+        self._fundamental = {(a, w): RollingStats(w) for a in self.accesses for w in self.windows}
+        self._deviation = {a: RollingStats() for a in self.accesses}  # |price - fundamental| / price
+        self._price_volatility = {w: list() for w in self.windows}
+        self._return_volatility = {w: list() for w in self.windows}
+        self._return_mean = {w: list() for w in self.windows}
+        self._arbitrage = {(a, w): list() for a in self.accesses for w in self.windows}
+        self._last = None  # (price, dividend) of previous iteration
+
+    def update(self, price: float, dividend: float, exchange: ExchangeAgent):
+        """
+        Add captured iteration
+
+        :param price: market price of iteration
+        :param dividend: dividend of iteration
+        :param exchange: exchange, source of future dividends and risk-free rate
+        """
+        self.risk_free = exchange.risk_free
+        fundamental = {a: Fundamentalist.evaluate(exchange.dividend(a), self.risk_free) for a in self.accesses}
+
+        for w in self.windows:
+            prices = self._prices[w]
+            if prices.full():
+                self._price_volatility[w].append(prices.std())
+                for a in self.accesses:
+                    market = prices.mean
+                    self._arbitrage[a, w].append(abs(market - self._fundamental[a, w].mean) / market)
+            prices.push(price)
+            for a in self.accesses:
+                self._fundamental[a, w].push(fundamental[a])
+        self._prices[None].push(price)
+        for a in self.accesses:
+            self._deviation[a].push(abs(price - fundamental[a]) / price)
+
+        if self._last is not None:
+            p, div = self._last
+            r = (price - p) / p + div / p  # stock return, see SimulatorInfo.stock_returns
+            for w in self.windows:
+                returns = self._returns[w]
+                if returns.full():
+                    self._return_volatility[w].append(returns.std())
+                    self._return_mean[w].append(returns.mean)
+                returns.push(r)
+            self._returns[None].push(r)
+        self._last = (price, dividend)
+        self.n_iter += 1
+
+    def tracks(self, window: int = None, access: int = None) -> bool:
+        """
+        :return: metrics of window (and access of arbitrage) are computed online
+        """
+        return (window is None or window in self._price_volatility) and (access is None or access in self._deviation)
+
+    def price_volatility(self, window: int = None) -> list or float:
+        if window is None:
+            return self._prices[None].std()
+        return self._price_volatility[window].copy()
+
+    def return_volatility(self, window: int = None) -> list or float:
+        if window is None:
+            return self._returns[None].std()
+        return self._return_volatility[window].copy()
+
+    def sharpe_ratio(self, window: int = None) -> list or float:
+        rf = self.risk_free
+        if window is None:
+            return (self._returns[None].mean - rf) / self._returns[None].std()
+        return [(m - rf) / v for m, v in zip(self._return_mean[window], self._return_volatility[window])]
+
+    def arbitrage(self, access: int = 1, window: int = None) -> list or float:
+        if window is None:
+            return self._deviation[access].mean
+        return self._arbitrage[access, window].copy()
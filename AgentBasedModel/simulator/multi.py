@@ -0,0 +1,199 @@
+from AgentBasedModel.agents.multi import MultiExchangeAgent, PortfolioChartist
+from AgentBasedModel.agents.population import Population
+from AgentBasedModel.simulator.simulator import SimulatorInfo
+import numpy as np
+from tqdm import tqdm
+
+
+class MultiSimulator:
+    """
+    MultiSimulator launches actions of portfolio traders on multi-instrument exchange
+    """
+    def __init__(self, exchange: MultiExchangeAgent = None, traders: list = None):
+        self.exchange = exchange
+        self.rng = exchange.rng  # random stream shared with exchange and traders
+        self.traders = traders
+        self.info = MultiSimulatorInfo(self.exchange, self.traders)  # links to existing objects
+
+    def _payments(self):
+        dividends = self.exchange.dividends()
+        rf = self.exchange.risk_free
+        for trader in self.traders:
+            # Dividend payments
+            trader.cash += float(trader.positions @ dividends)  # allow negative dividends
+            # Interest payment
+            trader.cash += trader.cash * rf  # allow risk-free loan
+
+    def simulate(self, n_iter: int, silent=False) -> object:
+        markets = self.exchange.markets
+        self.info.reserve(self.info.n_iter + n_iter)
+        for it in tqdm(range(n_iter), desc='Simulation', disable=silent):
+            for market in markets:
+                if market.tape is not None:
+                    market.tape.iteration = it
+
+            # Capture current info
+            self.info.capture()
+
+            # Change behaviour
+            for trader in self.traders:
+                if type(trader) == PortfolioChartist:
+                    trader.change_sentiment(self.info)
+
+            # Call Traders, each trader routes its orders to the instrument chosen
+            self.rng.shuffle(self.traders)
+            for trader in self.traders:
+                trader.call()
+
+            # Clear collected orders by call auction
+            for market in markets:
+                if market.clearing == 'call':
+                    market.clear()
+
+            # Payments and dividends
+            self._payments()  # pay dividends
+            self.exchange.generate_dividend()  # generate next dividends for all instruments
+
+        return self
+
+
+class MultiSimulatorInfo:
+    """
+    MultiSimulatorInfo is responsible for capturing data during simulating on multi-instrument exchange.
+    Market statistics of each instrument are captured by SimulatorInfo of the instrument: info[symbol].
+
+    Prices and per-agent series are stored in columnar arrays preallocated for the run: prices (iterations,
+    instruments), equity and cash (iterations, agents), positions (iterations, agents, instruments) and
+    sentiment (int8 codes of Population.sentiments, 0 - not a chartist). Lists of {trader_id: value} dicts
+    (equities, cash, positions, sentiments) are built lazily from arrays when accessed.
+    """
+    series = {'equities': np.float64, 'cash': np.float64, 'positions': int, 'sentiments': np.int8}
+
+    def __init__(self, exchange: MultiExchangeAgent = None, traders: list = None):
+        self.exchange = exchange
+        self.traders = {t.id: t for t in traders}  # traders by columns
+        self.markets = {symbol: SimulatorInfo(market, []) for symbol, market in
+                        zip(exchange.symbols, exchange.markets)}
+
+        self.sentiment_codes = {name: code for code, name in Population.sentiments.items()}  # sentiment -> code
+        self._agents = list(self.traders.values())
+        self._chartists = [c for c, t in enumerate(self._agents) if t.type == 'Chartist']  # columns of chartists
+        self.n_iter = 0  # number of iterations captured
+        self._prices = np.zeros((0, len(exchange)))
+        self._data = {name: np.zeros((0, len(self._agents)) + ((len(exchange),) if name == 'positions' else ()),
+                                     dtype=dtype) for name, dtype in self.series.items()}
+        self._views = dict()  # name -> list of dicts built from arrays
+
+        # Population of chartists at last capture
+        self.n_chartists = 0
+        self.n_optimistic = 0
+        self.n_pessimistic = 0
+
+    def __getitem__(self, symbol: str) -> SimulatorInfo:
+        return self.markets[symbol]
+
+    def reserve(self, n_iter: int):
+        """
+        Preallocate arrays for n_iter captured iterations in total
+        """
+        if n_iter > self._prices.shape[0]:
+            self._resize(n_iter)
+
+    def _resize(self, rows: int):
+        prices = np.zeros((rows,) + self._prices.shape[1:])
+        prices[:self.n_iter] = self._prices[:self.n_iter]
+        self._prices = prices
+        for name, old in self._data.items():
+            new = np.zeros((rows,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n_iter] = old[:self.n_iter]
+            self._data[name] = new
+
+    def capture(self):
+        """
+        Method called at the end of each iteration to capture basic info on simulation.
+
+        **Attributes:**
+
+        - :class:`list[ndarray]` **prices** --> prices of instruments on each iteration
+        - :class:`list[dict]` **equities** --> each agent's equity on each iteration
+        - :class:`list[dict]` **cash** --> each agent's cash on each iteration
+        - :class:`list[dict]` **positions** --> each agent's positions in instruments on each iteration
+        - :class:`list[dict]` **sentiments** --> each chartist's sentiment on each iteration
+        """
+        for info in self.markets.values():
+            info.capture()
+
+        r = self.n_iter
+        if r >= self._prices.shape[0]:  # rows are doubled if not reserved
+            self._resize(max(2 * r, 16))
+        data = self._data
+        self._prices[r] = [info.prices[-1] for info in self.markets.values()]
+        data['cash'][r] = [t.cash for t in self._agents]
+        data['positions'][r] = [t.positions for t in self._agents]
+        data['equities'][r] = data['cash'][r] + data['positions'][r] @ self._prices[r]
+        sentiments = [self.sentiment_codes[self._agents[c].sentiment] for c in self._chartists]
+        data['sentiments'][r, self._chartists] = sentiments
+        self.n_iter += 1
+
+        self.n_chartists = len(sentiments)
+        self.n_optimistic = sentiments.count(self.sentiment_codes['Optimistic'])
+        self.n_pessimistic = sentiments.count(self.sentiment_codes['Pessimistic'])
+
+    def _view(self, name: str) -> list:
+        """
+        :return: list of {trader_id: value} dicts of per-agent series, extended by new iterations
+        """
+        view = self._views.setdefault(name, list())
+        ids = list(self.traders.keys())
+        values = self._data[name]
+        for r in range(len(view), self.n_iter):
+            if name == 'positions':
+                view.append(dict(zip(ids, values[r].copy())))
+            elif name == 'sentiments':
+                codes = values[r, self._chartists].tolist()
+                view.append({ids[c]: Population.sentiments[s] for c, s in zip(self._chartists, codes)})
+            else:
+                view.append(dict(zip(ids, values[r].tolist())))
+        return view
+
+    @property
+    def prices(self) -> list:
+        return list(self._prices[:self.n_iter])
+
+    @property
+    def equities(self) -> list:
+        return self._view('equities')
+
+    @property
+    def cash(self) -> list:
+        return self._view('cash')
+
+    @property
+    def positions(self) -> list:
+        return self._view('positions')
+
+    @property
+    def sentiments(self) -> list:
+        return self._view('sentiments')
+
+    def market_return(self) -> float:
+        """
+        :return: average relative price change of instruments on last iteration
+        """
+        if self.n_iter < 2:
+            return 0
+        p, q = self._prices[self.n_iter - 1], self._prices[self.n_iter - 2]
+        return float(np.mean((p - q) / q))
+
+    def price_matrix(self) -> np.ndarray:
+        """
+        :return: prices of shape (iterations, instruments)
+        """
+        return self._prices[:self.n_iter].copy()
+
+    def return_correlation(self) -> np.ndarray:
+        """
+        :return: correlation matrix of instruments' price returns
+        """
+        p = self.price_matrix()
+        return np.corrcoef(((p[1:] - p[:-1]) / p[:-1]).T)
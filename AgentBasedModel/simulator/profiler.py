@@ -0,0 +1,117 @@
+from time import perf_counter
+import numpy as np
+
+
+class Profiler:
+    """
+    Profiler records wall time of each phase of each iteration and counts order book operations
+    (orders inserted, nodes walked in insert and fulfill, fills, cancels) during simulation. It is
+    attached to Simulator by profiler parameter, simulation is not instrumented without it.
+
+    Profilers of several runs are aggregated by merge() or sum().
+    """
+    phases = ('events', 'capture', 'behaviour', 'calls', 'clearing', 'payments', 'dividends')
+    counter_names = ('inserted', 'walked', 'filled', 'cancelled')
+
+    def __init__(self):
+        self.rows = list()  # iteration -> [seconds of each phase]
+        self.counters = {name: 0 for name in self.counter_names}  # totals of order book operations
+        self.runs = 0  # number of simulate calls profiled
+        self._index = {phase: i for i, phase in enumerate(self.phases)}
+        self._row = None
+        self._start = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __add__(self, other):
+        return Profiler().merge(self).merge(other)
+
+    def __radd__(self, other):
+        return self if other == 0 else self.__add__(other)  # support of sum()
+
+    def merge(self, other):
+        """
+        Add iterations and counters of other profiler
+
+        :return: self
+        """
+        self.rows.extend(other.rows)
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        self.runs += other.runs
+        return self
+
+    def start(self, exchange):
+        """
+        Start profiling of simulate call, order books of exchange count operations until stop
+        """
+        exchange.count_operations(True)
+        self._start = exchange.counters()
+        self.runs += 1
+
+    def stop(self, exchange):
+        """
+        Stop profiling of simulate call, counters are incremented by operations done since start
+        """
+        for name, value in exchange.counters().items():
+            self.counters[name] += value - self._start[name]
+        exchange.count_operations(False)
+        self._start = None
+
+    def begin(self) -> float:
+        """
+        Begin iteration
+
+        :return: current time
+        """
+        self._row = [0.] * len(self.phases)
+        self.rows.append(self._row)
+        return perf_counter()
+
+    def lap(self, phase: str, t: float) -> float:
+        """
+        Add time since t to phase of current iteration
+
+        :param phase: name of phase, one of phases
+        :param t: time phase started
+        :return: current time
+        """
+        now = perf_counter()
+        self._row[self._index[phase]] += now - t
+        return now
+
+    def times(self, phase: str = None) -> np.ndarray:
+        """
+        :param phase: name of phase, all phases if None
+        :return: seconds spent in phase at each iteration, or (iterations, phases) array
+        """
+        times = np.array(self.rows, dtype=float).reshape(-1, len(self.phases))
+        if phase is None:
+            return times
+        return times[:, self.phases.index(phase)]
+
+    def summary(self) -> dict:
+        """
+        :return: {phase: {'total': seconds, 'mean': seconds per iteration, 'share': part of total time}}
+        """
+        times = self.times()
+        total = times.sum()
+        res = dict()
+        for i, phase in enumerate(self.phases):
+            res[phase] = {'total': float(times[:, i].sum()), 'mean': float(times[:, i].mean()) if len(times) else 0.,
+                          'share': float(times[:, i].sum() / total) if total else 0.}
+        return res
+
+    def report(self) -> str:
+        """
+        :return: table of phase times and operation counters
+        """
+        lines = [f'{len(self)} iterations, {self.runs} runs',
+                 f'{"phase":<12}{"total, s":>12}{"per it, ms":>12}{"share":>8}']
+        for phase, stats in self.summary().items():
+            lines.append(f'{phase:<12}{stats["total"]:>12.3f}{stats["mean"] * 1e3:>12.3f}{stats["share"]:>8.1%}')
+        lines.append(f'{"counter":<12}{"total":>12}{"per it":>12}')
+        for name, value in self.counters.items():
+            lines.append(f'{name:<12}{value:>12}{value / max(len(self), 1):>12.1f}')
+        return '\n'.join(lines)
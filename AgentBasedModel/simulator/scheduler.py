@@ -0,0 +1,94 @@
+from heapq import heappush, heappop
+
+
+class MarketState:
+    """
+    MarketState holds market variables conditions of events are evaluated on, updated once per iteration
+    from cached top-of-book of exchange.
+    """
+    def __init__(self):
+        self.iteration = None
+        self.price = None  # market price
+        self.peak = None  # running maximum of market price
+        self.drawdown = 0  # relative fall of price from its running maximum
+
+    def update(self, exchange, it: int):
+        self.iteration = it
+        self.price = exchange.price()
+        self.peak = self.price if self.peak is None else max(self.peak, self.price)
+        self.drawdown = (self.peak - self.price) / self.peak if self.peak else 0
+
+
+class EventScheduler:
+    """
+    EventScheduler returns events due at iteration without polling all of them. Timed events (single and
+    recurring) are kept in a heap by next activation iteration, conditional events are evaluated once per
+    iteration on MarketState and activated each time their condition becomes true.
+
+    Events due at the same iteration are returned in order they were added.
+    """
+    def __init__(self, events: list = None, start: int = 0):
+        """
+        :param events: list of events linked to simulator
+        :param start: first iteration to be simulated, events activated before it are skipped
+        """
+        self.start = start
+        self.state = MarketState()
+        self._heap = list()  # (iteration, sequence number, event)
+        self._conditional = list()  # [sequence number, event, condition value at previous iteration]
+        self._n = 0  # number of events added
+        for event in events or list():
+            self.add(event)
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._conditional)
+
+    def add(self, event):
+        """
+        Schedule event from its activation iteration or from start, whichever is later
+        """
+        seq = self._n
+        self._n += 1
+        if event.condition is not None:
+            self._conditional.append([seq, event, False])
+            return
+
+        it = event.it
+        if it < self.start:
+            if event.every is None:
+                return  # single event in the past is never activated
+            it += -(-(self.start - it) // event.every) * event.every  # first activation from start
+        if event.until is None or it <= event.until:
+            heappush(self._heap, (it, seq, event))
+
+    def due(self, it: int, exchange) -> list:
+        """
+        :param it: current iteration
+        :param exchange: exchange agent market state is taken from
+        :return: events activated at iteration it
+        """
+        timed = list()
+        heap = self._heap
+        while heap and heap[0][0] <= it:
+            next_it, seq, event = heappop(heap)
+            if next_it == it:
+                timed.append((seq, event))
+            if event.every is not None:
+                next_it += event.every
+                if event.until is None or next_it <= event.until:
+                    heappush(heap, (next_it, seq, event))
+
+        if not self._conditional:
+            return [event for seq, event in timed]
+
+        self.state.update(exchange, it)
+        for item in self._conditional:
+            seq, event, previous = item
+            active = event.it <= it and (event.until is None or it <= event.until)
+            value = active and bool(event.condition(self.state))
+            if value and not previous:
+                event.triggered = it
+                timed.append((seq, event))
+            item[2] = value
+        timed.sort(key=lambda x: x[0])
+        return [event for seq, event in timed]
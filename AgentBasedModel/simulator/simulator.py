@@ -1,18 +1,72 @@
-from AgentBasedModel.agents import ExchangeAgent, Universalist, Chartist, Fundamentalist
+from AgentBasedModel.agents import ExchangeAgent, Universalist, Chartist, Fundamentalist, Population, Aggregates,\
+    EmptyBookError
+from AgentBasedModel.simulator.scheduler import EventScheduler
+from AgentBasedModel.simulator.profiler import Profiler
+from AgentBasedModel.simulator.metrics import OnlineMetrics
 from AgentBasedModel.utils.math import mean, std, difference, rolling
-import random
+from collections import OrderedDict
+from functools import wraps
+from bisect import bisect_right
 from tqdm import tqdm
+import numpy as np
+import pickle
+
+
+class Termination:
+    """
+    Termination describes why simulation stopped before requested number of iterations
+
+    **Reasons:**
+
+    - **empty book** --> bid or ask side of order book is empty, price cannot be determined
+    - **spread** --> relative bid-ask spread exceeded max_spread
+    - **cash** --> cash of some trader fell below min_cash
+    """
+    def __init__(self, reason: str, iteration: int, message: str):
+        self.reason = reason
+        self.iteration = iteration  # iteration simulation stopped at, it is not completed
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f'Termination (reason={self.reason}, it={self.iteration}): {self.message}'
 
 
 class Simulator:
     """
-    Simulator is responsible for launching agents' actions and executing scenarios
+    Simulator is responsible for launching agents' actions and executing scenarios. Simulation stops
+    early with Termination stored in info.termination if market degenerates: a side of order book
+    becomes empty, or optionally spread or traders' losses run away.
     """
-    def __init__(self, exchange: ExchangeAgent = None, traders: list = None, events: list = None):
+    def __init__(self, exchange: ExchangeAgent = None, traders: list = None, events: list = None,
+                 population: Population = None, max_spread: float = None, min_cash: float = None,
+                 profiler: Profiler = None, profile: str = 'full', stride: int = 1, sink=None,
+                 metrics: OnlineMetrics = None):
+        """
+        :param exchange: exchange agent
+        :param traders: list of traders
+        :param events: list of events (scenario)
+        :param population: agents stored in arrays, their members act along with traders
+        :param max_spread: stop if (ask - bid) / price exceeds it, not checked if None
+        :param min_cash: stop if cash of any trader falls below it, not checked if None
+        :param profiler: records phase times and order book operations, not profiled if None
+        :param profile: capture profile of info, 'minimal', 'market' or 'full', see SimulatorInfo
+        :param stride: per-agent series of info are recorded every stride iterations
+        :param sink: InfoSink history of info is streamed to, kept in memory if None
+        :param metrics: metrics of info computed during simulation, see OnlineMetrics
+        """
         self.exchange = exchange
+        self.rng = exchange.rng  # random stream shared with exchange, traders and events
         self.events = [event.link(self) for event in events] if events else None  # link all events to simulator
-        self.traders = traders
-        self.info = SimulatorInfo(self.exchange, self.traders)  # links to existing objects
+        self.scheduler = EventScheduler(self.events)  # events due at each iteration
+        self.traders = traders if traders is not None else list()
+        self.population = population
+        # links to existing objects
+        self.info = SimulatorInfo(self.exchange, self.traders, population, profile, stride, sink, metrics)
+        self.iteration = 0  # number of iterations simulated
+        self.max_spread = max_spread
+        self.min_cash = min_cash
+        self.profiler = profiler
+        self._changers = None  # (traders list, its length, any agent changes behaviour)
 
     def _payments(self):
         for trader in self.traders:
@@ -20,44 +74,297 @@ class Simulator:
             trader.cash += trader.assets * self.exchange.dividend()  # allow negative dividends
             # Interest payment
             trader.cash += trader.cash * self.exchange.risk_free  # allow risk-free loan
+        if self.population is not None:
+            self.population.pay(self.exchange.dividend(), self.exchange.risk_free)
+
+    def snapshot(self) -> bytes:
+        """
+        Capture full state of simulation at current iteration: exchange with order and dividend books,
+        traders, population, random stream and SimulatorInfo. Events and profiler are not captured. Orders of
+        order books are serialized as array columns of their OrderPool.
+
+        :return: serialized simulator, see restore
+        """
+        events, scheduler, profiler = self.events, self.scheduler, self.profiler
+        self.events, self.scheduler, self.profiler = None, None, None
+        try:
+            return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            self.events, self.scheduler, self.profiler = events, scheduler, profiler
+
+    @classmethod
+    def restore(cls, snapshot: bytes, events: list = None) -> 'Simulator':
+        """
+        Restore simulation from snapshot, it continues from iteration of snapshot with its own copy of
+        all objects. Restored simulations share random stream state of snapshot, so that branches differ
+        only by events.
+
+        :param snapshot: serialized simulator, see snapshot
+        :param events: list of events (scenario) of restored simulation
+        :return: independent Simulator
+        """
+        simulator = pickle.loads(snapshot)
+        simulator.events = [event.link(simulator) for event in events] if events else None
+        simulator.scheduler = EventScheduler(simulator.events, simulator.iteration)
+        return simulator
+
+    def fork(self, events: list = None) -> 'Simulator':
+        """
+        Branch simulation at current iteration, see snapshot and restore
+
+        :param events: list of events (scenario) of branch
+        :return: independent Simulator
+        """
+        return self.restore(self.snapshot(), events)
+
+    @property
+    def termination(self) -> Termination or None:
+        return self.info.termination
+
+    def _changing(self) -> bool:
+        """
+        :return: True if any agent changes behaviour, so that population variables are needed
+        """
+        traders = self.traders
+        if self._changers is None or self._changers[0] is not traders or self._changers[1] != len(traders):
+            changing = self.population is not None or any(type(tr) in (Universalist, Chartist) for tr in traders)
+            self._changers = (traders, len(traders), changing)  # recomputed when traders list changes
+        return self._changers[2]
+
+    def _check(self, it: int) -> Termination or None:
+        """
+        Check market for degenerate state before iteration it
+
+        :return: Termination if simulation cannot or should not continue, None otherwise
+        """
+        spread = self.exchange.spread()
+        if spread is None:
+            side = 'bid' if not self.exchange.order_book['bid'] else 'ask'
+            return Termination('empty book', it, f'{side} side of order book is empty')
+
+        if self.max_spread is not None:
+            rel_spread = (spread['ask'] - spread['bid']) / self.exchange.price()
+            if rel_spread > self.max_spread:
+                return Termination('spread', it, f'relative spread {rel_spread:.4f} exceeds {self.max_spread}')
+
+        if self.min_cash is not None:
+            cash = min([trader.cash for trader in self.traders], default=self.min_cash)
+            if self.population is not None and len(self.population):
+                cash = min(cash, float(self.population.cash.min()))
+            if cash < self.min_cash:
+                return Termination('cash', it, f'trader cash {cash:.2f} is below {self.min_cash}')
 
     def simulate(self, n_iter: int, silent=False) -> object:
-        for it in tqdm(range(n_iter), desc='Simulation', disable=silent):
-            # Call scenario
-            if self.events:
-                for event in self.events:
-                    event.call(it)
-
-            # Capture current info
-            self.info.capture()
-
-            # Change behaviour
-            for trader in self.traders:
-                if type(trader) == Universalist:
-                    trader.change_strategy(self.info)
-                elif type(trader) == Chartist:
-                    trader.change_sentiment(self.info)
-
-            # Call Traders
-            random.shuffle(self.traders)
-            for trader in self.traders:
-                trader.call()
-
-            # Payments and dividends
-            self._payments()  # pay dividends
-            self.exchange.generate_dividend()  # generate next dividends
+        """
+        Simulate n_iter iterations, or until market degenerates, see Termination
+
+        :param n_iter: number of iterations
+        :param silent: disable progress bar
+        :return: self
+        """
+        self.info.reserve(self.info.n_iter + n_iter)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start(self.exchange)
+        try:
+            for it in tqdm(range(self.iteration, self.iteration + n_iter), desc='Simulation', disable=silent):
+                try:
+                    termination = self._step(it)
+                except EmptyBookError as error:  # book emptied during iteration
+                    termination = Termination('empty book', it, str(error))
+                if termination is not None:
+                    self.info.termination = termination
+                    break
+                self.iteration += 1
+        finally:
+            if profiler is not None:
+                profiler.stop(self.exchange)  # order books stop counting on any exit
+        if self.info.sink is not None:
+            self.info.sink.save(self.info)
 
         return self
 
+    def _step(self, it: int) -> Termination or None:
+        """
+        Simulate iteration it. Phases are shared with subclasses, which override how agents change
+        behaviour (_behaviour) and act (_activate).
+
+        :return: Termination if market degenerated before iteration, None otherwise
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = prof.begin()
+        if self.exchange.tape is not None:
+            self.exchange.tape.iteration = it
+
+        # Call scenario
+        if self.scheduler:
+            for event in self.scheduler.due(it, self.exchange):
+                event.call(it)
+        self._sync()
+
+        termination = self._check(it)
+        if termination is not None:
+            return termination
+        if prof is not None:
+            t = prof.lap('events', t)
+
+        # Capture current info
+        self.info.sync(self.traders)  # traders added by events are recorded from now on
+        self.info.capture()
+        if prof is not None:
+            t = prof.lap('capture', t)
+
+        # Change behaviour
+        aggregates = self._behaviour()
+        if prof is not None:
+            t = prof.lap('behaviour', t)
+
+        # Call Traders
+        self._activate(it, aggregates)
+        if prof is not None:
+            t = prof.lap('calls', t)
+
+        # Clear collected orders by call auction
+        if self.exchange.clearing == 'call':
+            self.exchange.clear()
+        if prof is not None:
+            t = prof.lap('clearing', t)
+
+        # Payments and dividends
+        self._payments()  # pay dividends
+        if prof is not None:
+            t = prof.lap('payments', t)
+        self.exchange.generate_dividend()  # generate next dividends
+        if prof is not None:
+            prof.lap('dividends', t)
+
+    def _sync(self):
+        """
+        Synchronize agents with traders list after events, nothing to do as all traders act every iteration
+        """
+
+    def _behaviour(self) -> Aggregates or None:
+        """
+        Change sentiment and strategy of traders and population at iteration boundary
+
+        :return: population variables of iteration, None if no agent changes behaviour
+        """
+        if not self._changing():
+            return None
+        aggregates = Aggregates(self.info)  # population variables shared by all traders
+        for trader in self.traders:
+            if type(trader) == Universalist:
+                trader.change_strategy(self.info, aggregates=aggregates)
+            elif type(trader) == Chartist:
+                trader.change_sentiment(self.info, aggregates=aggregates)
+        if self.population is not None:
+            self.population.change(self.info, aggregates=aggregates)
+        return aggregates
+
+    def _activate(self, it: int, aggregates: Aggregates or None):
+        """
+        Call traders and members of population in random order, each acts once per iteration
+
+        :param it: iteration
+        :param aggregates: population variables of iteration
+        """
+        self.rng.shuffle(self.traders)
+        if self.population is not None:
+            self.population.draw()  # decisions of all members at once
+            agents = self.traders + self.population.members
+            self.rng.shuffle(agents)
+        else:
+            agents = self.traders
+        for trader in agents:
+            trader.call()
+
+
+def memoized(method):
+    """
+    Cache results of derived series of SimulatorInfo by (method, arguments, capture version, dividend book
+    version of exchange) in LRU cache of info holding at most cache_size results. Cache is cleared by capture(),
+    lists are returned as copies.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())), self.version, self.exchange.dividend_version)
+        cache = self._cache
+        if key in cache:
+            cache.move_to_end(key)
+            res = cache[key]
+        else:
+            res = method(self, *args, **kwargs)
+            cache[key] = res
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)  # least recently used
+        return res.copy() if isinstance(res, list) else res
+    return wrapper
+
 
 class SimulatorInfo:
     """
     SimulatorInfo is responsible for capturing data during simulating
+
+    Market statistics are stored as lists. Per-agent statistics are stored in columnar arrays of shape
+    (iterations, agents) preallocated for the run: equity, cash, return (float64), assets (int32), type and
+    sentiment (int8 codes, see type_names and sentiment_names). Each agent has a stable column (see columns):
+    traders passed on creation first, then agents added during simulation (e.g. by MarketMakerIn) in order
+    they were added, recorded from iteration they joined. Members of population are captured from
+    population arrays at once.
+
+    Lists of {trader_id: value} dicts (equities, cash, assets, types, sentiments, returns) are built lazily
+    from arrays when accessed, and extended by iterations captured since previous access.
+
+    **Capture profiles:**
+
+    - *minimal* --> prices and dividends
+    - *market* --> prices, dividends, spreads and order book statistics
+    - *full* --> market series and per-agent series
+
+    Per-agent series are recorded every stride-th iteration: row r of arrays and r-th element of per-agent
+    lists is iteration r * stride. Values of current iteration (see row) are available in every profile,
+    they are captured on demand, so that simulations where no trader changes behaviour do not read agents.
+
+    If sink (InfoSink) is given, history is streamed to disk in chunks: lists and arrays hold only
+    iterations from offset (row_offset of per-agent series), full history is read by StoredInfo.
+
+    If metrics (OnlineMetrics) is given, it is updated on each capture, and volatility, Sharpe ratio and
+    arbitrage of its windows are returned from it instead of being recomputed from history.
+
+    Derived series (fundamental value, returns, volatility, Sharpe ratio, arbitrage) are memoized until
+    next capture or change of dividend book, see memoized.
     """
+    profiles = ('minimal', 'market', 'full')
+    series = {'equities': np.float64, 'cash': np.float64, 'assets': np.int32, 'types': np.int8,
+              'sentiments': np.int8, 'returns': np.float64}  # per-agent series -> dtype of array
+    cache_size = 128  # max number of memoized results of derived series
 
-    def __init__(self, exchange: ExchangeAgent = None, traders: list = None):
+    def __init__(self, exchange: ExchangeAgent = None, traders: list = None, population: Population = None,
+                 profile: str = 'full', stride: int = 1, sink=None, metrics: OnlineMetrics = None):
+        """
+        :param exchange: exchange agent
+        :param traders: list of traders
+        :param population: agents stored in arrays, their members are recorded after traders
+        :param profile: capture profile, 'minimal', 'market' or 'full'
+        :param stride: per-agent series are recorded every stride iterations (full profile)
+        :param sink: InfoSink history is streamed to, kept in memory if None
+        :param metrics: metrics computed during simulation, not computed online if None
+        """
+        if profile not in self.profiles:
+            raise ValueError(f'Unknown capture profile: {profile}, expected one of {list(self.profiles)}')
+        if stride < 1:
+            raise ValueError(f'Stride must be positive, got {stride}')
         self.exchange = exchange
-        self.traders = {t.id: t for t in traders}
+        members = population.members if population is not None else list()
+        self.traders = {t.id: t for t in traders + members}  # traders of economy, first columns
+        self.population = population
+        self.profile = profile
+        self.stride = stride
+        self.sink = sink
+        self.metrics = metrics
 
         # Market Statistics
         self.prices = list()  # price at the end of iteration
@@ -66,12 +373,35 @@ class SimulatorInfo:
         self.orders = list()  # order book statistics
 
         # Agent statistics
-        self.equities = list()  # agent: equity
-        self.cash = list()  # agent: cash
-        self.assets = list()  # agent: number of assets
-        self.types = list()  # agent: current type
-        self.sentiments = list()  # agent: current sentiment
-        self.returns = [{tr_id: 0 for tr_id in self.traders.keys()}]  # agent: iteration return
+        self.type_names = list(Population.types)  # type code -> type, codes of population types are kept
+        self.sentiment_names = dict(Population.sentiments)  # sentiment code -> sentiment, 0 - no sentiment
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}  # type -> type code
+        self.sentiment_codes = {name: code for code, name in self.sentiment_names.items()}  # sentiment -> code
+        self.columns = dict()  # agent id -> column of agent in arrays
+        self.agents = list()  # column -> agent
+        self.joined = list()  # column -> first iteration agent was recorded at
+        self.n_iter = 0  # number of iterations captured
+        self.n_rows = 0  # number of iterations per-agent series are recorded at
+        self.offset = 0  # number of iterations flushed to sink
+        self.row_offset = 0  # number of rows of per-agent series flushed to sink
+        self._data = {name: np.zeros((0, 0), dtype=dtype) for name, dtype in self.series.items()}
+        self._live = {name: np.zeros(0, dtype=dtype) for name, dtype in self.series.items()}  # current values
+        self._live_it = None  # iteration live values were captured at
+        self._live_n = 0  # number of agents live values were captured for
+        self._objects = list()  # columns of agents captured one by one (not population members)
+        self._members = None  # (first, last + 1) column of population members
+        self._views = dict()  # name -> list of dicts built from arrays
+        self._synced = None  # traders list agents were last synchronized with
+        self._n_synced = 0
+        for trader in traders:
+            self.add(trader)
+        if population is not None:
+            self._members = (len(self.agents), len(self.agents) + len(members))
+            for member in members:
+                self.add(member)
+        self.termination = None  # Termination if simulation stopped early
+        self.version = 0  # number of captures, derived series are cached for version
+        self._cache = OrderedDict()  # (method, args, kwargs, version, dividend version) -> result
 
         """
         # Market Statistics
@@ -90,6 +420,112 @@ class SimulatorInfo:
         self.assets_value = list()  # sum of value of assets of agents
         """
 
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_views'] = dict()  # views are rebuilt from arrays
+        state['_synced'] = None
+        state['sink'] = None  # copies do not write to files of sink
+        state['_cache'] = OrderedDict()
+        return state
+
+    def add(self, trader):
+        """
+        Record trader from current iteration, trader already recorded is skipped
+        """
+        if trader.id in self.columns:
+            return
+        column = len(self.agents)
+        self.columns[trader.id] = column
+        self.agents.append(trader)
+        self.joined.append(self.n_iter)
+        if self._members is None or not self._members[0] <= column < self._members[1]:
+            self._objects.append(column)
+
+        capacity = self._live['cash'].shape[0]
+        if column >= capacity:  # columns are doubled
+            capacity = max(2 * capacity, column + 1)
+            for name, old in self._live.items():
+                self._live[name] = np.zeros(capacity, dtype=old.dtype)
+                self._live[name][:old.shape[0]] = old
+            if self.profile == 'full':
+                self._resize(self._data['cash'].shape[0], capacity)
+
+    def sync(self, traders: list):
+        """
+        Record traders added to simulation since previous call (events may add traders), traders removed
+        from simulation are recorded further
+        """
+        if traders is self._synced and len(traders) == self._n_synced:
+            return
+        for trader in traders:
+            self.add(trader)
+        self._synced = traders
+        self._n_synced = len(traders)
+
+    def reserve(self, n_iter: int):
+        """
+        Preallocate arrays for n_iter captured iterations in total
+        """
+        if self.sink is not None:  # at most a chunk is held
+            n_iter = min(n_iter, self.offset + self.sink.chunk + 2)
+        rows = -(-n_iter // self.stride) - self.row_offset
+        if self.profile == 'full' and rows > self._data['cash'].shape[0]:
+            self._resize(rows, self._live['cash'].shape[0])
+
+    def _resize(self, rows: int, cols: int):
+        for name, old in self._data.items():
+            new = np.zeros((rows, cols), dtype=old.dtype)
+            new[:old.shape[0], :old.shape[1]] = old
+            self._data[name] = new
+
+    def row(self, name: str, it: int = -1) -> np.ndarray:
+        """
+        :param name: per-agent series, one of series
+        :param it: captured iteration, last if -1, iterations other than last are recorded in full profile
+            every stride iterations
+        :return: values of all recorded agents at iteration by columns, agents not joined yet have 0
+        """
+        if self.n_iter == 0:
+            if name == 'returns':  # return before first iteration
+                return np.zeros(len(self.agents))
+            raise ValueError('No iterations captured')
+        it %= self.n_iter
+        if it == self.n_iter - 1:
+            if self._live_it != it:
+                self._capture_agents()
+            return self._live[name][:len(self.agents)]
+        if self.profile != 'full' or it % self.stride:
+            raise ValueError(f'Per-agent series are not recorded at iteration {it}')
+        if it < self.offset:
+            raise ValueError(f'Iteration {it} is flushed to sink, see StoredInfo')
+        return self._data[name][it // self.stride - self.row_offset, :len(self.agents)]
+
+    def data(self, rows: int = None) -> dict:
+        """
+        :param rows: number of rows, all rows held if None
+        :return: {name: array of per-agent series (rows, agents)} of rows held in memory, from row_offset
+        """
+        if rows is None:
+            rows = self.n_rows - self.row_offset
+        return {name: values[:rows, :len(self.agents)] for name, values in self._data.items()}
+
+    def _flush(self):
+        """
+        Write the oldest chunk to sink and drop it from memory
+        """
+        n = self.sink.chunk
+        rows = -(-(self.offset + n) // self.stride) - self.row_offset if self.profile == 'full' else 0
+        self.sink.flush(self, rows)
+
+        del self.prices[:n], self.dividends[:n], self.spreads[:n], self.orders[:n]
+        held = self.n_rows - self.row_offset - rows
+        for values in self._data.values():
+            values[:held] = values[rows:rows + held]
+        self.offset += n
+        self.row_offset += rows
+        self._views = dict()
+        self.sink.save(self, tail=False)  # meta of flushed chunks, readable while simulation runs
+
     def capture(self):
         """
         Method called at the end of each iteration to capture basic info on simulation.
@@ -99,49 +535,151 @@ class SimulatorInfo:
         *Market Statistics*
 
         - :class:`list[float]` **prices** --> stock prices on each iteration
-        - :class:`list[dict]` **spreads** --> order book spreads on each iteration
+        - :class:`list[dict]` **spreads** --> order book spreads on each iteration (market, full)
         - :class:`list[float]` **dividends** --> dividend paid on each iteration
         - :class:`list[dict[dict]]` **orders** --> order book price, volume, quantity stats on each iteration
+          (market, full)
 
-        *Traders Statistics*
+        *Traders Statistics* (full, every stride iterations)
 
         - :class:`list[dict]` **equities** --> each agent's equity on each iteration
         - :class:`list[dict]` **cash** --> each agent's cash on each iteration
         - :class:`list[dict]` **assets** --> each agent's number of stocks on each iteration
         - :class:`list[dict]` **types** --> each agent's type on each iteration
+        - :class:`list[dict]` **sentiments** --> each Chartist's sentiment on each iteration
+        - :class:`list[dict]` **returns** --> each agent's return on each iteration
         """
         # Market Statistics
         self.prices.append(self.exchange.price())
-        self.spreads.append((self.exchange.spread()))
         self.dividends.append(self.exchange.dividend())
-        self.orders.append({
-            'quantity': {'bid': len(self.exchange.order_book['bid']), 'ask': len(self.exchange.order_book['ask'])},
-            # 'price mean': {
-            #     'bid': mean([order.price for order in self.exchange.order_book['bid']]),
-            #     'ask': mean([order.price for order in self.exchange.order_book['ask']])},
-            # 'price std': {
-            #     'bid': std([order.price for order in self.exchange.order_book['bid']]),
-            #     'ask': std([order.price for order in self.exchange.order_book['ask']])},
-            # 'volume sum': {
-            #     'bid': sum([order.qty for order in self.exchange.order_book['bid']]),
-            #     'ask': sum([order.qty for order in self.exchange.order_book['ask']])},
-            # 'volume mean': {
-            #     'bid': mean([order.qty for order in self.exchange.order_book['bid']]),
-            #     'ask': mean([order.qty for order in self.exchange.order_book['ask']])},
-            # 'volume std': {
-            #     'bid': std([order.qty for order in self.exchange.order_book['bid']]),
-            #     'ask': std([order.qty for order in self.exchange.order_book['ask']])}
-        })
+        if self.metrics is not None:
+            self.metrics.update(self.prices[-1], self.dividends[-1], self.exchange)
+        if self.profile != 'minimal':
+            self.spreads.append((self.exchange.spread()))
+            bid_stats = self.exchange.order_book['bid'].stats()
+            ask_stats = self.exchange.order_book['ask'].stats()
+            self.orders.append({stat: {'bid': bid_stats[stat], 'ask': ask_stats[stat]} for stat in bid_stats})
+        it = self.n_iter
+        self.n_iter += 1
 
         # Trader Statistics
-        self.equities.append({t_id: t.equity() for t_id, t in self.traders.items()})
-        self.cash.append({t_id: t.cash for t_id, t in self.traders.items()})
-        self.assets.append({t_id: t.assets for t_id, t in self.traders.items()})
-        self.types.append({t_id: t.type for t_id, t in self.traders.items()})
-        self.sentiments.append({t_id: t.sentiment for t_id, t in self.traders.items() if t.type == 'Chartist'})
-        self.returns.append({tr_id: (self.equities[-1][tr_id] - self.equities[-2][tr_id]) / self.equities[-2][tr_id]
-                             for tr_id in self.traders.keys()}) if len(self.equities) > 1 else None
+        if self.profile == 'full' and it % self.stride == 0:
+            self._capture_agents()
+            r = self.n_rows - self.row_offset
+            if r >= self._data['cash'].shape[0]:  # rows are doubled if not reserved
+                self._resize(max(2 * r, 16), self._live['cash'].shape[0])
+            n = len(self.agents)
+            for name, values in self._live.items():
+                self._data[name][r, :n] = values[:n]
+            self.n_rows += 1
+        elif self.profile == 'full' and (it + 1) % self.stride == 0:
+            self._capture_agents()  # equities preceding recorded iteration, so that returns are one-iteration
+
+        if self.sink is not None and len(self.prices) > self.sink.chunk + 1:  # last two are kept for price change
+            self._flush()
+        self.version += 1
+        if self._cache:
+            self._cache.clear()
+
+    def _capture_agents(self):
+        """
+        Capture current values of agents (live values) at last captured iteration. Return of agent is taken
+        from its equity at previous capture of agents, 0 for agents not captured before.
+        """
+        live = self._live
+        n = len(self.agents)
+        if self._objects:
+            columns = self._objects if len(self._objects) < n else slice(0, n)
+            agents = [self.agents[c] for c in self._objects] if len(self._objects) < n else self.agents
+            type_codes, sentiment_codes = self.type_codes, self.sentiment_codes
+            try:
+                types = [type_codes[tr.type] for tr in agents]
+            except KeyError:  # new type is coded
+                for tr in agents:
+                    if tr.type not in type_codes:
+                        type_codes[tr.type] = len(self.type_names)
+                        self.type_names.append(tr.type)
+                types = [type_codes[tr.type] for tr in agents]
+            live['cash'][columns] = [tr.cash for tr in agents]
+            live['assets'][columns] = [tr.assets for tr in agents]
+            live['types'][columns] = types
+            live['sentiments'][columns] = [sentiment_codes.get(getattr(tr, 'sentiment', None), 0)
+                                           for tr in agents]
+        if self._members is not None:
+            first, last = self._members
+            population = self.population
+            live['cash'][first:last] = population.cash
+            live['assets'][first:last] = population.assets
+            live['types'][first:last] = population.type
+            live['sentiments'][first:last] = population.sentiment
+
+        m = self._live_n if self._live_it is not None else 0  # agents with previous equity
+        previous = live['equities'][:m].copy()
+        live['equities'][:n] = live['cash'][:n] + live['assets'][:n] * self.prices[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            live['returns'][:m] = (live['equities'][:m] - previous) / previous
+        live['returns'][m:n] = 0
+        self._live_it = self.n_iter - 1
+        self._live_n = n
+
+    def _view(self, name: str) -> list:
+        """
+        :return: list of {trader_id: value} dicts of per-agent series, extended by new iterations
+        """
+        view = self._views.setdefault(name, list())
+        rows = self.n_rows - self.row_offset
+        if len(view) < rows:
+            first = len(view)
+            view.extend(self._dicts(name, self._data[name][first:rows], self._data['types'][first:rows],
+                                    self.row_offset + first))
+        return view
+
+    def _dicts(self, name: str, values: np.ndarray, types: np.ndarray, first: int):
+        """
+        :param values: rows of per-agent series
+        :param types: rows of types
+        :param first: row number of first row
+        :return: generator of {trader_id: value} dicts of rows
+        """
+        ids = list(self.columns.keys())
+        chartist = self.type_codes.get('Chartist')
+        for r in range(len(values)):
+            n = bisect_right(self.joined, (first + r) * self.stride)  # agents recorded at iteration
+            if name == 'types':
+                yield dict(zip(ids[:n], [self.type_names[c] for c in values[r, :n].tolist()]))
+            elif name == 'sentiments':
+                codes = zip(ids[:n], types[r, :n].tolist(), values[r, :n].tolist())
+                yield {t_id: self.sentiment_names.get(s) for t_id, t, s in codes if t == chartist}
+            else:
+                yield dict(zip(ids[:n], values[r, :n].tolist()))
+
+    @property
+    def equities(self) -> list:
+        return self._view('equities')
+
+    @property
+    def cash(self) -> list:
+        return self._view('cash')
 
+    @property
+    def assets(self) -> list:
+        return self._view('assets')
+
+    @property
+    def types(self) -> list:
+        return self._view('types')
+
+    @property
+    def sentiments(self) -> list:
+        return self._view('sentiments')
+
+    @property
+    def returns(self) -> list:
+        if self.n_iter == 0 and self.profile == 'full':  # return before first iteration
+            return [{tr_id: 0 for tr_id in self.traders.keys()}]
+        return self._view('returns')
+
+    @memoized
     def fundamental_value(self, access: int = 1) -> list:
         divs = self.dividends.copy()
         n = len(divs)  # number of iterations
@@ -150,34 +688,60 @@ class SimulatorInfo:
 
         return [Fundamentalist.evaluate(divs[i:i+access], r) for i in range(n)]
 
+    @memoized
+    def rolling_mean(self, series: str, window: int, access: int = 1) -> list:
+        """
+        :param series: 'prices', 'dividends' or 'fundamental_value'
+        :param window: number of iterations averaged
+        :param access: number of future dividends of fundamental value
+        :return: moving average of series, see utils.math.rolling
+        """
+        if series == 'fundamental_value':
+            return rolling(self.fundamental_value(access), window)
+        return rolling(getattr(self, series), window)
+
+    @memoized
     def stock_returns(self) -> list:
         p = self.prices
         div = self.dividends
         return [(p[i+1] - p[i]) / p[i] + div[i] / p[i] for i in range(len(p) - 1)]
 
+    @memoized
     def abnormal_returns(self) -> list:
         rf = self.exchange.risk_free
         return [r - rf for r in self.stock_returns()]
 
+    @memoized
     def return_volatility(self, window: int = None) -> list or float:
+        if self.metrics is not None and self.metrics.tracks(window):
+            return self.metrics.return_volatility(window)
+        returns = self.stock_returns()
         if window is None:
-            return std(self.stock_returns())
-        n = len(self.stock_returns())
-        return [std(self.stock_returns()[i:i+window]) for i in range(n - window)]
+            return std(returns)
+        return [std(returns[i:i+window]) for i in range(len(returns) - window)]
 
+    @memoized
     def price_volatility(self, window: int = None) -> list or float:
+        if self.metrics is not None and self.metrics.tracks(window):
+            return self.metrics.price_volatility(window)
         if window is None:
             return std(self.prices)
         return [std(self.prices[i:i+window]) for i in range(len(self.prices) - window)]
 
+    @memoized
     def sharpe_ratio(self, window: int = None) -> list or float:
+        if self.metrics is not None and self.metrics.tracks(window):
+            return self.metrics.sharpe_ratio(window)
         if window is None:
             return mean(self.abnormal_returns()) / self.return_volatility()
         ab_returns = rolling(self.abnormal_returns(), window)
         volatility = self.return_volatility(window)
         return [ab_returns[i] / volatility[i] for i in range(len(ab_returns))]
 
+    @memoized
     def arbitrage(self, access: int = 1, window: int = None) -> list or float:
+        if self.metrics is not None and self.metrics.tracks(window, access):
+            return self.metrics.arbitrage(access, window)
         if window is None:
             market = self.prices
             fundamental = self.fundamental_value(access)
@@ -0,0 +1,280 @@
+from AgentBasedModel.agents import Fundamentalist
+from AgentBasedModel.simulator.simulator import SimulatorInfo, Termination, memoized
+from collections import OrderedDict
+from bisect import bisect_right
+import numpy as np
+import json
+import os
+
+
+class InfoSink:
+    """
+    InfoSink streams history captured by SimulatorInfo to directory on disk, so that memory used by
+    SimulatorInfo does not grow with number of iterations. Every chunk iterations the oldest chunk of
+    series is written to .npy files and dropped from SimulatorInfo, iterations not flushed yet are
+    written as tail at the end of each simulate call. Written history is read by StoredInfo.
+
+    **Files:**
+
+    - *meta.json* --> number of chunks and iterations, agents, codes, dividends and parameters of market
+    - *<series>.<chunk>.npy* --> chunk of market series (prices, dividends, spread_bid, spread_ask, orders)
+      or per-agent series (equities, cash, assets, types, sentiments, returns)
+    - *<series>.tail.npy* --> iterations after the last chunk
+    """
+    def __init__(self, path: str, chunk: int = 1000):
+        """
+        :param path: directory files are written to, created if it does not exist
+        :param chunk: number of iterations in chunk
+        """
+        if chunk < 1:
+            raise ValueError(f'Chunk must be positive, got {chunk}')
+        self.path = path
+        self.chunk = chunk
+        self.n_chunks = 0  # number of chunks written
+        self.n_rows = list()  # chunk -> number of rows of per-agent series
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, series: str, chunk: int or str) -> str:
+        suffix = f'{chunk:05d}' if isinstance(chunk, int) else chunk
+        return os.path.join(self.path, f'{series}.{suffix}.npy')
+
+    @staticmethod
+    def _market(info: SimulatorInfo, n: int) -> dict:
+        """
+        :return: market series of first n iterations held by info as arrays
+        """
+        res = {'prices': np.array(info.prices[:n], dtype=float), 'dividends': np.array(info.dividends[:n], dtype=float)}
+        if info.profile != 'minimal':
+            stats = list(info.orders[0]) if info.orders else list()
+            res['spread_bid'] = np.array([s['bid'] for s in info.spreads[:n]], dtype=float)
+            res['spread_ask'] = np.array([s['ask'] for s in info.spreads[:n]], dtype=float)
+            res['orders'] = np.array([[orders[stat][side] for stat in stats for side in ('bid', 'ask')]
+                                      for orders in info.orders[:n]], dtype=float)  # None -> NaN
+            res['orders'] = res['orders'].reshape(-1, 2 * len(stats))
+        return res
+
+    def _write(self, info: SimulatorInfo, chunk: int or str, n: int, rows: int):
+        for series, values in self._market(info, n).items():
+            np.save(self._file(series, chunk), values)
+        if info.profile == 'full':
+            for series, values in info.data(rows).items():
+                np.save(self._file(series, chunk), values)
+
+    def flush(self, info: SimulatorInfo, rows: int):
+        """
+        Write the oldest chunk of info, meta data is written by save once info dropped the chunk
+
+        :param info: SimulatorInfo holding at least chunk iterations
+        :param rows: number of rows of per-agent series in chunk
+        """
+        self._write(info, self.n_chunks, self.chunk, rows)
+        self.n_chunks += 1
+        self.n_rows.append(rows)
+
+    def save(self, info: SimulatorInfo, tail: bool = True):
+        """
+        Write iterations held by info as tail (optionally) and meta data
+        """
+        n = len(info.prices)
+        if tail:
+            for file in os.listdir(self.path):
+                if file.endswith('.tail.npy'):
+                    os.remove(os.path.join(self.path, file))
+            if n:
+                self._write(info, 'tail', n, info.n_rows - info.row_offset)
+
+        termination = info.termination
+        meta = {
+            'chunk': self.chunk,
+            'n_chunks': self.n_chunks,
+            'n_rows': self.n_rows,
+            'n_iter': info.offset + (n if tail else 0),
+            'tail': n if tail else 0,
+            'tail_rows': info.n_rows - info.row_offset if tail and info.profile == 'full' else 0,
+            'profile': info.profile,
+            'stride': info.stride,
+            'order_stats': list(info.orders[0].keys()) if info.orders else list(),
+            'agents': [agent.id for agent in info.agents],
+            'joined': info.joined,
+            'n_traders': len(info.traders),
+            'type_names': info.type_names,
+            'sentiment_names': {str(code): name for code, name in info.sentiment_names.items()},
+            'risk_free': info.exchange.risk_free,
+            'dividend_book': [float(div) for div in info.exchange.dividend_book],
+            'termination': termination.__dict__ if termination is not None else None
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+
+
+class ChunkedSeries:
+    """
+    ChunkedSeries is read-only sequence over series stored in chunk files. Chunks are memory-mapped, so
+    that values are read from disk only when accessed. Slices within one chunk are views of file, other
+    slices are copied.
+    """
+    def __init__(self, files: list):
+        self.chunks = [np.load(file, mmap_mode='r') for file in files]
+        self.starts = [0]  # chunk -> index of its first element
+        for chunk in self.chunks:
+            self.starts.append(self.starts[-1] + len(chunk))
+
+    def __len__(self) -> int:
+        return self.starts[-1]
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk.tolist()
+
+    def __array__(self, dtype=None, copy=None):
+        if not self.chunks:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(self.chunks).astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return np.asarray(self)[key]
+            if stop <= start:
+                return np.asarray(self)[0:0]
+            first, last = self._locate(start), self._locate(stop - 1)
+            if first == last:
+                offset = self.starts[first]
+                return self.chunks[first][start - offset:stop - offset]
+            return np.concatenate([self.chunks[i][max(start - self.starts[i], 0):stop - self.starts[i]]
+                                   for i in range(first, last + 1)])
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('ChunkedSeries index out of range')
+        i = self._locate(key)
+        value = self.chunks[i][key - self.starts[i]]
+        return value.item() if np.ndim(value) == 0 else value
+
+    def _locate(self, index: int) -> int:
+        return bisect_right(self.starts, index) - 1
+
+    def tolist(self) -> list:
+        return list(self)
+
+
+class ExchangeRecord:
+    """
+    ExchangeRecord holds parameters of exchange stored with history: risk-free rate and dividend book
+    at the end of simulation.
+    """
+    def __init__(self, risk_free: float, dividend_book: list):
+        self.risk_free = risk_free
+        self.dividend_book = dividend_book
+        self.dividend_version = 0  # stored book does not change
+
+    def dividend(self, access: int = None) -> list or float:
+        if access is None:
+            return self.dividend_book[0]
+        return self.dividend_book[:access]
+
+
+class StoredInfo(SimulatorInfo):
+    """
+    StoredInfo reads history written by InfoSink. Market series (prices, dividends) are memory-mapped
+    ChunkedSeries, so that methods of SimulatorInfo, science.states and visualization functions run on
+    data on disk. Spreads, order book statistics and per-agent lists of dicts are built when accessed.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: directory written by InfoSink
+        """
+        with open(os.path.join(path, 'meta.json')) as file:
+            meta = json.load(file)
+        self.path = path
+        self.meta = meta
+        self.exchange = ExchangeRecord(meta['risk_free'], meta['dividend_book'])
+        self.profile = meta['profile']
+        self.stride = meta['stride']
+        self.type_names = meta['type_names']
+        self.sentiment_names = {int(code): name for code, name in meta['sentiment_names'].items()}
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.sentiment_codes = {name: code for code, name in self.sentiment_names.items()}
+        self.columns = {t_id: column for column, t_id in enumerate(meta['agents'])}
+        self.joined = meta['joined']
+        self.n_iter = meta['n_iter']
+        self.n_rows = sum(meta['n_rows']) + meta['tail_rows']
+        self.offset = 0
+        self.row_offset = 0
+        self.termination = Termination(**meta['termination']) if meta['termination'] is not None else None
+        self.metrics = None  # metrics are computed from stored history
+        self.version = 0  # stored history does not change
+        self._cache = OrderedDict()
+
+        self.prices = self.series('prices')
+        self.dividends = self.series('dividends')
+        self._views = dict()
+
+    def series(self, name: str) -> ChunkedSeries:
+        """
+        :param name: name of stored series, e.g. 'prices', 'spread_bid', 'orders', 'equities'
+        :return: memory-mapped series, rows of per-agent series have width of agents recorded at chunk
+        """
+        files = [os.path.join(self.path, f'{name}.{i:05d}.npy') for i in range(self.meta['n_chunks'])]
+        tail = os.path.join(self.path, f'{name}.tail.npy')
+        if self.meta['tail'] and os.path.exists(tail):
+            files.append(tail)
+        return ChunkedSeries([file for file in files if os.path.exists(file)])
+
+    @property
+    def traders(self) -> dict:
+        """
+        :return: {trader_id: None} of traders of economy, traders are not stored
+        """
+        return {t_id: None for t_id in self.meta['agents'][:self.meta['n_traders']]}
+
+    @property
+    def spreads(self) -> list:
+        return [{'bid': bid, 'ask': ask} for bid, ask in zip(self.series('spread_bid'), self.series('spread_ask'))]
+
+    @property
+    def orders(self) -> list:
+        stats = self.meta['order_stats']
+        res = list()
+        for values in self.series('orders'):
+            values = [None if v != v else v for v in values]  # NaN -> None
+            res.append({stat: {'bid': values[2 * i], 'ask': values[2 * i + 1]} for i, stat in enumerate(stats)})
+        return res
+
+    @memoized
+    def fundamental_value(self, access: int = 1) -> list:
+        divs = np.asarray(self.dividends).tolist()
+        n = len(divs)
+        divs.extend(self.exchange.dividend(access)[1:access])  # add not recorded future divs
+        r = self.exchange.risk_free
+        return [Fundamentalist.evaluate(divs[i:i+access], r) for i in range(n)]
+
+    def row(self, name: str, it: int = -1) -> np.ndarray:
+        """
+        :param name: per-agent series, one of series
+        :param it: iteration recorded (every stride iterations in full profile)
+        :return: values of all recorded agents at iteration by columns, agents not joined yet have 0
+        """
+        it %= self.n_iter
+        if self.profile != 'full' or it % self.stride:
+            raise ValueError(f'Per-agent series are not recorded at iteration {it}')
+        values = self.series(name)[it // self.stride]
+        res = np.zeros(len(self.columns), dtype=values.dtype)
+        res[:len(values)] = values
+        return res
+
+    def _view(self, name: str) -> list:
+        if name in self._views:
+            return self._views[name]
+        view = list()
+        if self.profile == 'full':
+            values, types = self.series(name), self.series('types')
+            for values_chunk, types_chunk, first in zip(values.chunks, types.chunks, values.starts):
+                view.extend(self._dicts(name, np.asarray(values_chunk), np.asarray(types_chunk), first))
+        self._views[name] = view
+        return view
+
+    @property
+    def returns(self) -> list:
+        return self._view('returns')
@@ -1 +1,4 @@
-from AgentBasedModel.utils.orders import Order, OrderList
+from AgentBasedModel.utils.orders import Order, OrderPool, OrderList, LevelOrderList, CountingOrderList, \
+    CountingLevelOrderList, LiveOrders
+from AgentBasedModel.utils.tape import TradeTape
+from AgentBasedModel.utils.rng import RandomStream
@@ -1,72 +1,78 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+_HASH = 2654435761  # odd multiplier close to 2^32 / golden ratio, scatters consecutive order ids over hash table
+
+
 class Order:
     """
     Order contains all relevant information about order, it can be of two types: bid, ask. Supports binary comparison
     operations of price among all pairs of order types according to the logic:
 
     **better-offer < worse-offer**
+
+    While order rests in order book it is a handle of row in OrderPool of the book: quantity is read from and
+    written to the pool. Order out of the book (new, executed or cancelled) keeps quantity it had when last read.
+    Orders of the book are created on access (see OrderPool.view), views of the same order are equal.
     """
-    order_id = 0
+    __slots__ = ('price', '_qty', 'order_type', 'trader', 'order_id', 'pool', 'handle')
+    id = 0
 
     def __init__(self, price, qty, order_type, trader_link=None):
         # Properties
         self.price = price
-        self.qty = qty
+        self._qty = qty
         self.order_type = order_type
         self.trader = trader_link
-        self.order_id = Order.order_id
+        self.order_id = Order.id
 
-        # Connections
-        self.left = None
-        self.right = None
-        Order.order_id += 1
+        # Row of order in pool, while order rests in book
+        self.pool = None
+        self.handle = -1
+        Order.id += 1
 
-    def __lt__(self, other) -> bool:
-        if self.order_type != other.order_type:
-            if self.order_type == 'bid':
-                return self.price > other.price
-            if self.order_type == 'ask':
-                return self.price < other.price
+    @property
+    def qty(self):
+        pool = self.pool
+        if pool is not None and pool.order_id[self.handle] == self.order_id:
+            self._qty = pool.qty[self.handle]
+        return self._qty
 
+    @qty.setter
+    def qty(self, value):
+        self._qty = value
+        pool = self.pool
+        if pool is not None and pool.order_id[self.handle] == self.order_id:
+            pool.qty[self.handle] = value
+
+    # Comparison depends only on the type of left operand: bid - higher price is better, ask - lower price is better
+    def __lt__(self, other) -> bool:
         if self.order_type == 'bid':
             return self.price > other.price
-        if self.order_type == 'ask':
-            return self.price < other.price
+        return self.price < other.price
 
     def __le__(self, other) -> bool:
-        if self.order_type != other.order_type:
-            if self.order_type == 'bid':
-                return self.price >= other.price
-            if self.order_type == 'ask':
-                return self.price <= other.price
-
         if self.order_type == 'bid':
             return self.price >= other.price
-        if self.order_type == 'ask':
-            return self.price <= other.price
+        return self.price <= other.price
 
     def __gt__(self, other) -> bool:
-        if self.order_type != other.order_type:
-            if self.order_type == 'bid':
-                return self.price < other.price
-            if self.order_type == 'ask':
-                return self.price > other.price
-
         if self.order_type == 'bid':
             return self.price < other.price
-        if self.order_type == 'ask':
-            return self.price > other.price
+        return self.price > other.price
 
     def __ge__(self, other) -> bool:
-        if self.order_type != other.order_type:
-            if self.order_type == 'bid':
-                return self.price <= other.price
-            if self.order_type == 'ask':
-                return self.price >= other.price
-
         if self.order_type == 'bid':
             return self.price <= other.price
-        if self.order_type == 'ask':
-            return self.price >= other.price
+        return self.price >= other.price
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Order) and self.order_id == other.order_id
+
+    def __hash__(self) -> int:
+        return hash(self.order_id)
 
     def __repr__(self) -> str:
         return f'{self.order_type} (price={self.price}, qty={self.qty})'
@@ -80,80 +86,540 @@ class Order:
         return Order(order_dict['price'], order_dict['qty'], order_dict['order_type'], order_dict.get('trader_link'))
 
 
+class OrderPool:
+    """
+    OrderPool stores resting orders as array columns, order is addressed by integer handle - its row. Order lists
+    hold handles only and link rows by left and right columns, orders of one trader are linked by t_prev and
+    t_next in order of arrival. Resting order takes about 50 bytes of columns (and 8-16 bytes of hash table if
+    added one at a time) instead of Python object with attributes, links and index entries. Rows of orders that
+    left the book are reused, columns grow by 1/8 when full.
+
+    Both sides of exchange share one pool, so that order is found by its id without knowing its side: orders
+    loaded in bulk with consecutive ids are found by id arithmetic, others by hash table of handles (open
+    addressing with linear probing).
+
+    add, remove, find, view: complexity O(1)
+    """
+    def __init__(self):
+        # Columns, row = handle
+        self.price = array('d')
+        self.qty = array('q')
+        self.side = array('b')  # 1 - bid, -1 - ask, 0 - free row
+        self.trader = array('i')  # position in traders, -1 if no trader
+        self.order_id = array('q')  # -1 for free row
+        self.left = array('i')  # better order in list, -1 if none
+        self.right = array('i')  # worse order in list (next free row for free rows), -1 if none
+        self.t_prev = array('i')  # previous order of the same trader, -1 if none
+        self.t_next = array('i')  # next order of the same trader, -1 if none
+        self.t_pos = array('i')  # position in LiveOrders of trader
+        self.size = 0  # number of rows used, columns may have room for more
+        self.free = -1  # first free row
+
+        self.traders = list()  # traders of orders that entered the pool
+        self._traders = dict()  # id(trader) -> position in traders
+        self.table = array('i', [-1]) * 8  # handles of orders added one at a time, -1 - empty slot
+        self.n_indexed = 0  # number of handles in table
+
+        # Runs of consecutive ids stored in consecutive rows by load, sorted by first id
+        self.run_ids = list()  # first order_id
+        self.run_handles = list()  # first handle
+        self.run_sizes = list()  # number of orders
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_traders']  # keyed by object ids, rebuilt on deserialization
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._traders = {id(trader): i for i, trader in enumerate(self.traders)}
+
+    def register(self, trader) -> int:
+        """
+        :return: position of trader in traders, trader is added if new
+        """
+        t = self._traders.get(id(trader))
+        if t is None:
+            t = self._traders[id(trader)] = len(self.traders)
+            self.traders.append(trader)
+        return t
+
+    def _grow(self, n: int):
+        """
+        Make room for at least n more rows
+        """
+        capacity = len(self.price)
+        extra = max(self.size + n, capacity + capacity // 8 + 8) - capacity
+        self.price.extend(array('d', [0]) * extra)
+        self.qty.extend(array('q', [0]) * extra)
+        self.side.extend(array('b', [0]) * extra)
+        self.order_id.extend(array('q', [-1]) * extra)
+        for column in (self.trader, self.left, self.right, self.t_prev, self.t_next, self.t_pos):
+            column.extend(array('i', [-1]) * extra)
+
+    def add(self, order: Order, side: int) -> int:
+        """
+        Store order in free row and bind order to it
+
+        :param order: Order
+        :param side: 1 - bid, -1 - ask
+        :return: handle
+        """
+        h = self.free
+        if h != -1:
+            self.free = self.right[h]
+        else:
+            h = self.size
+            if h == len(self.price):
+                self._grow(1)
+            self.size = h + 1
+        trader = order.trader
+        if trader is not None:
+            live = trader.orders
+            if live.pool is not self:
+                live.bind(self, trader)
+            t = live.row
+        else:
+            t = -1
+        self.price[h] = order.price
+        self.qty[h] = order._qty  # order is not bound to live row
+        self.side[h] = side
+        self.trader[h] = t
+        self.order_id[h] = order.order_id
+        self.left[h] = self.right[h] = -1
+
+        # Index handle
+        if 2 * self.n_indexed + 2 > len(self.table):
+            self._rehash()
+        table, mask = self.table, len(self.table) - 1
+        i = order.order_id * _HASH & mask
+        while table[i] != -1:
+            i = (i + 1) & mask
+        table[i] = h
+        self.n_indexed += 1
+
+        order.pool = self
+        order.handle = h
+        if t != -1:
+            live.add(h)
+        return h
+
+    def load(self, orders: list, side: int) -> int:
+        """
+        Store orders in new consecutive rows linked in given order, and bind orders to them
+
+        complexity O(n)
+
+        :param orders: list[Order]
+        :param side: 1 - bid, -1 - ask
+        :return: handle of first order
+        """
+        n, h0 = len(orders), self.size
+        if h0 + n > len(self.price):
+            self._grow(n)
+        self.size = h0 + n
+        ids = [order.order_id for order in orders]
+        rows = slice(h0, h0 + n)
+        self.price[rows] = array('d', [order.price for order in orders])
+        self.qty[rows] = array('q', [order.qty for order in orders])
+        self.side[rows] = array('b', [side]) * n
+        self.trader[rows] = array('i', [-1 if order.trader is None else self.register(order.trader)
+                                        for order in orders])
+        self.order_id[rows] = array('q', ids)
+        self.left[rows] = array('i', [-1]) + array('i', range(h0, h0 + n - 1))
+        self.right[rows] = array('i', range(h0 + 1, h0 + n)) + array('i', [-1])
+
+        # Split ids into runs of consecutive ids
+        bounds = (np.flatnonzero(np.diff(ids) != 1) + 1).tolist()
+        for start, end in zip([0] + bounds, bounds + [n]):
+            i = bisect_right(self.run_ids, ids[start])
+            self.run_ids.insert(i, ids[start])
+            self.run_handles.insert(i, h0 + start)
+            self.run_sizes.insert(i, end - start)
+
+        for h, order in enumerate(orders, h0):
+            order.pool = self
+            order.handle = h
+            if order.trader is not None:
+                live = order.trader.orders
+                if live.pool is not self:
+                    live.bind(self, order.trader)
+                live.add(h)
+        return h0
+
+    def remove(self, h: int):
+        """
+        Free row of order that left the book
+
+        :param h: handle
+        :return: void
+        """
+        t = self.trader[h]
+        if t != -1:
+            self.traders[t].orders.discard(h)
+
+        # Drop handle from hash table, orders loaded in bulk are not there
+        table, ids, mask = self.table, self.order_id, len(self.table) - 1
+        i = ids[h] * _HASH & mask
+        g = table[i]
+        while g != h and g != -1:
+            i = (i + 1) & mask
+            g = table[i]
+        if g == h:
+            # Backward shift: move following handles of probe sequence to the hole, if it is on their probe path
+            j = (i + 1) & mask
+            g = table[j]
+            while g != -1:
+                if (j - ids[g] * _HASH) & mask >= (j - i) & mask:
+                    table[i] = g
+                    i = j
+                j = (j + 1) & mask
+                g = table[j]
+            table[i] = -1
+            self.n_indexed -= 1
+
+        ids[h] = -1
+        self.side[h] = 0
+        self.right[h] = self.free
+        self.free = h
+
+    def _rehash(self):
+        """
+        Double hash table and index handles of old one again
+        """
+        table, ids = array('i', [-1]) * (2 * len(self.table)), self.order_id
+        mask = len(table) - 1
+        for h in self.table:
+            if h != -1:
+                i = ids[h] * _HASH & mask
+                while table[i] != -1:
+                    i = (i + 1) & mask
+                table[i] = h
+        self.table = table
+
+    def find(self, order_id: int) -> int:
+        """
+        :return: handle of resting order with order_id, -1 if order is not in pool
+        """
+        table, ids, mask = self.table, self.order_id, len(self.table) - 1
+        i = order_id * _HASH & mask
+        while table[i] != -1:
+            if ids[table[i]] == order_id:
+                return table[i]
+            i = (i + 1) & mask
+
+        i = bisect_right(self.run_ids, order_id) - 1
+        if i < 0 or order_id - self.run_ids[i] >= self.run_sizes[i]:
+            return -1
+        h = self.run_handles[i] + order_id - self.run_ids[i]
+        return h if self.order_id[h] == order_id else -1
+
+    def view(self, h: int) -> Order:
+        """
+        :return: Order bound to row h
+        """
+        order = Order.__new__(Order)
+        order.price = self.price[h]
+        order._qty = self.qty[h]
+        order.order_type = 'bid' if self.side[h] == 1 else 'ask'
+        t = self.trader[h]
+        order.trader = self.traders[t] if t != -1 else None
+        order.order_id = self.order_id[h]
+        order.pool = self
+        order.handle = h
+        return order
+
+
+class LiveOrders:
+    """
+    LiveOrders holds orders of one trader resting in order book. OrderPool adds order when it enters the book
+    and drops it when it leaves the book (executed or cancelled), so only live orders are tracked. Handles of
+    orders are stored in indexable array, removed order is replaced by the last one (swap-remove). Orders are
+    also linked in pool in order of arrival, from first (oldest) to last (newest).
+
+    add, discard, [i], oldest, newest: complexity O(1)
+    """
+    __slots__ = ('pool', 'row', 'items', 'first', 'last')
+
+    def __init__(self):
+        self.pool = None  # OrderPool of orders, set by first order (see bind)
+        self.row = -1  # position of trader in traders of pool
+        self.items = array('i')  # handles of live orders, random access
+        self.first = -1  # handle of oldest order
+        self.last = -1  # handle of newest order
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def __iter__(self):
+        return map(self.pool.view, self.items) if self.pool is not None else iter(())
+
+    def __getitem__(self, i: int) -> Order:
+        return self.pool.view(self.items[i])
+
+    def __contains__(self, order: Order) -> bool:
+        pool = self.pool
+        return pool is not None and order.pool is pool and pool.order_id[order.handle] == order.order_id \
+            and order.trader is not None and order.trader.orders is self
+
+    def bind(self, pool: OrderPool, trader):
+        """
+        Attach to pool orders of trader rest in
+
+        :param pool: OrderPool
+        :param trader: owner of orders
+        :return: void
+        """
+        if self.items:
+            raise ValueError('Orders of trader should rest in order books of one exchange')
+        self.pool = pool
+        self.row = pool.register(trader)
+
+    def add(self, h: int):
+        pool = self.pool
+        pool.t_pos[h] = len(self.items)
+        self.items.append(h)
+        pool.t_prev[h] = self.last
+        pool.t_next[h] = -1
+        if self.last != -1:
+            pool.t_next[self.last] = h
+        else:
+            self.first = h
+        self.last = h
+
+    def discard(self, h: int):
+        pool = self.pool
+        i = pool.t_pos[h]
+        last = self.items.pop()
+        if last != h:
+            self.items[i] = last
+            pool.t_pos[last] = i
+
+        prev, nxt = pool.t_prev[h], pool.t_next[h]
+        if prev != -1:
+            pool.t_next[prev] = nxt
+        else:
+            self.first = nxt
+        if nxt != -1:
+            pool.t_prev[nxt] = prev
+        else:
+            self.last = prev
+
+    def oldest(self) -> Order:
+        return self.pool.view(self.first)
+
+    def newest(self) -> Order:
+        return self.pool.view(self.last)
+
+
 class OrderIter:
     """
     Iterator class for OrderList
     """
     def __init__(self, order_list):
-        self.order = order_list.first
+        self.pool = order_list.pool
+        self.handle = order_list.head
 
     def __next__(self) -> Order:
-        if self.order:
-            next_order = self.order
-            self.order = self.order.right
-            return next_order
+        h = self.handle
+        if h != -1:
+            self.handle = self.pool.right[h]
+            return self.pool.view(h)
         raise StopIteration
 
 
 # noinspection DuplicatedCode
 class OrderList:
     """
-    OrderList is implemented as a doubly linked list. It preserves the same order type inside,
+    OrderList is implemented as a doubly linked list of rows of OrderPool. It preserves the same order type inside,
     all orders are sorted according to best-offer -> worst-offer dynamically.
 
     remove, append, push: complexity O(1)
 
     insert, fulfill (for large qty): complexity O(n)
+
+    len, stats: complexity O(1)
     """
-    def __init__(self, order_type: str):
-        self.first = None
-        self.last = None
+    # Operation counters, incremented only by counting lists (see CountingOrderList) installed by Profiler
+    n_inserted = 0  # orders added
+    n_walked = 0  # nodes walked in insert and fulfill
+    n_filled = 0  # fills of resting orders
+    n_cancelled = 0  # orders cancelled
+
+    def __init__(self, order_type: str, pool: OrderPool = None):
+        """
+        :param order_type: 'bid' or 'ask'
+        :param pool: OrderPool storing orders, shared by both sides of exchange; new pool if None
+        """
         self.order_type = order_type
+        self.pool = pool if pool is not None else OrderPool()
+        self._sign = 1 if order_type == 'bid' else -1  # side in pool, key = sign * price
+        self.head = -1  # handle of best order
+        self.tail = -1  # handle of worst order
+        self.tape = None  # TradeTape recording fills, if set
+        self.version = 0  # mutation counter, incremented on every change of list
+
+        # Running aggregates, updated on insert, fill and remove
+        self.count = 0  # number of orders
+        self.volume = 0  # sum of qty
+        self.volume_sq = 0  # sum of qty^2
+        self.price_sum = 0  # sum of price
+        self.price_sq = 0  # sum of price^2
 
     def __iter__(self) -> OrderIter:
         return OrderIter(self)
 
     def __bool__(self):
-        return self.first is not None and self.last is not None
+        return self.head != -1
 
     def __len__(self):
-        n = 0
-        for order in self:
-            n += 1
-        return n
+        return self.count
 
-    def to_list(self) -> list:
-        return [order.to_dict() for order in self]
+    def __contains__(self, order: Order) -> bool:
+        return self._handle(order) != -1
 
-    def remove(self, order: Order):
+    @property
+    def first(self) -> Order or None:
+        return self.pool.view(self.head) if self.head != -1 else None
+
+    @property
+    def last(self) -> Order or None:
+        return self.pool.view(self.tail) if self.tail != -1 else None
+
+    def _handle(self, order: Order) -> int:
+        """
+        :return: handle of order, -1 if order is not in the list
+        """
+        pool, h = order.pool, order.handle
+        if pool is self.pool and pool.order_id[h] == order.order_id and pool.side[h] == self._sign:
+            return h
+        return -1
+
+    def _add(self, order: Order) -> int:
+        """
+        Store order in pool, order is not linked yet
+
+        :return: handle
+        """
         if order.order_type != self.order_type:
             raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
-        if order == self.first:
-            self.first = order.right
-        if order == self.last:
-            self.last = order.left
+        if order.pool is not None and order.pool.order_id[order.handle] == order.order_id:
+            raise ValueError(f'Order {order.order_id} is already in order book')
+        self._register(order)
+        return self.pool.add(order, self._sign)
 
-        if order.left:
-            order.left.right = order.right
-        if order.right:
-            order.right.left = order.left
+    def _register(self, order: Order):
+        qty, price = order.qty, order.price
+        self.version += 1
+        self.count += 1
+        self.volume += qty
+        self.volume_sq += qty * qty
+        self.price_sum += price
+        self.price_sq += price * price
 
-        order.left = None
-        order.right = None
+    def stats(self) -> dict:
+        """
+        Order list statistics from running aggregates, complexity O(1)
 
-    def append(self, order: Order):
-        # If wrong order type to insert
+        :return: {'quantity': int, 'price mean': float, 'price std': float, 'volume sum': int,
+            'volume mean': float, 'volume std': float}
+        """
+        n = self.count
+        if not n:
+            return {'quantity': 0, 'price mean': None, 'price std': None, 'volume sum': 0, 'volume mean': None,
+                    'volume std': None}
+        price_mean = self.price_sum / n
+        volume_mean = self.volume / n
+        return {
+            'quantity': n,
+            'price mean': price_mean,
+            'price std': max(self.price_sq / n - price_mean**2, 0)**.5,
+            'volume sum': self.volume,
+            'volume mean': volume_mean,
+            'volume std': max(self.volume_sq / n - volume_mean**2, 0)**.5
+        }
+
+    def to_list(self) -> list:
+        return [order.to_dict() for order in self]
+
+    # Linking of stored orders
+    def _append(self, h: int):
+        self.pool.left[h] = self.tail
+        if self.tail != -1:
+            self.pool.right[self.tail] = h
+        else:
+            self.head = h
+        self.tail = h
+
+    def _push(self, h: int):
+        self.pool.right[h] = self.head
+        if self.head != -1:
+            self.pool.left[self.head] = h
+        else:
+            self.tail = h
+        self.head = h
+
+    def _link_before(self, nxt: int, h: int):
+        left, right = self.pool.left, self.pool.right
+        prev = left[nxt]
+        left[h] = prev
+        right[h] = nxt
+        right[prev] = h
+        left[nxt] = h
+
+    def _remove(self, h: int):
+        pool = self.pool
+        left, right = pool.left, pool.right
+        prev, nxt = left[h], right[h]
+        if prev != -1:
+            right[prev] = nxt
+        else:
+            self.head = nxt
+        if nxt != -1:
+            left[nxt] = prev
+        else:
+            self.tail = prev
+
+        qty, price = pool.qty[h], pool.price[h]
+        self.version += 1
+        self.count -= 1
+        self.volume -= qty
+        self.volume_sq -= qty * qty
+        self.price_sum -= price
+        self.price_sq -= price * price
+        pool.remove(h)
+
+    def remove(self, order: Order):
         if order.order_type != self.order_type:
             raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
-
-        if not self.first:
-            self.first = order
-            self.last = order
+        h = self._handle(order)
+        # Order is not in the list (already executed or cancelled)
+        if h == -1:
             return
+        self._remove(h)
 
-        self.last.right = order
-        order.left = self.last
-        self.last = order
+    def prune(self):
+        """
+        Remove orders with no quantity left, complexity O(n)
+
+        :return: void
+        """
+        qty, right = self.pool.qty, self.pool.right
+        h = self.head
+        while h != -1:
+            nxt = right[h]
+            if qty[h] <= 0:
+                self._remove(h)
+            h = nxt
+
+    def append(self, order: Order):
+        self._append(self._add(order))
 
     def push(self, order: Order):
         """
@@ -162,21 +628,7 @@ class OrderList:
         :param order: Order
         :return: void
         """
-        # If wrong order type to insert
-        if order.order_type != self.order_type:
-            raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
-
-        if not self.first:
-            self.first = order
-            self.last = order
-            return
-
-        self.first.left = order
-        order.right = self.first
-        self.first = order
-
-        if order.order_type != self.order_type:
-            raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
+        self._push(self._add(order))
 
     def insert(self, order: Order):
         """
@@ -185,81 +637,170 @@ class OrderList:
         :param order: Order
         :return: void
         """
-        # If wrong order type to insert
-        if order.order_type != self.order_type:
-            raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
+        h = self._add(order)
 
         # If empty
-        if self.first is None:
-            self.append(order)
+        if self.head == -1:
+            self._append(h)
+            return
 
         # Insert order in the beginning
-        if order <= self.first:
-            order.right = self.first
-            self.first.left = order
-            self.first = order
+        if self._sign * order.price >= self._sign * self.pool.price[self.head]:
+            self._push(h)
             return
 
         # Insert order in the middle
-        for val in self:
-            if order <= val:
-                # If only 1 order in self
-                if self.first == self.last:
-                    self.push(order)
-
-                order.left = val.left
-                order.right = val
-                order.left.right = order
-                order.right.left = order
-                return
+        nxt = self._find(order)
+        if nxt != -1:
+            self._link_before(nxt, h)
+            return
 
         # Insert to the end
-        self.append(order)
+        self._append(h)
+
+    def _find(self, order: Order) -> int:
+        """
+        :return: handle of first order in list the order is inserted before, -1 if it is inserted to the end
+        """
+        price, right = self.pool.price, self.pool.right
+        sign = self._sign
+        key = sign * order.price
+        h = self.head
+        while h != -1 and key < sign * price[h]:
+            h = right[h]
+        return h
 
     def fulfill(self, order: Order, t_cost: float) -> Order:
         if order.order_type == self.order_type:
             raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {order.order_type}')
+        pool, tape = self.pool, self.tape
+        prices, qtys, traders, right = pool.price, pool.qty, pool.trader, pool.right
+        sign = self._sign
+        side = -sign
+        trader = order.trader
+        taker = trader.id if trader is not None else -1
+        key = sign * order.price
+        qty = order.qty
 
-        for val in self:
-            if order.qty == 0:
-                break
-            if val > order:
+        h = self.head
+        while h != -1 and qty:
+            if sign * prices[h] < key:
                 break
+            nxt = right[h]
 
             # Solve orders
-            tmp_qty = min(order.qty, val.qty)  # Quantity traded currently
-            tmp_price = val.price  # Price traded
-            val.qty -= tmp_qty
-            order.qty -= tmp_qty
+            tmp_qty = min(qty, qtys[h])  # Quantity traded currently
+            tmp_price = prices[h]  # Price traded
+            qty -= tmp_qty
+            t = traders[h]
+            maker = pool.traders[t] if t != -1 else None
 
             # Solve cash and assets
-            if order.order_type == 'bid':
-                if order.trader is not None:
-                    order.trader.cash -= tmp_price * tmp_qty * (1 + t_cost)
-                    order.trader.assets += tmp_qty
-                if val.trader is not None:
-                    val.trader.cash += tmp_price * tmp_qty * (1 - t_cost)
-                    val.trader.assets -= tmp_qty
-
-            if order.order_type == 'ask':
-                if order.trader is not None:
-                    order.trader.cash += tmp_price * tmp_qty * (1 - t_cost)
-                    order.trader.assets -= tmp_qty
-                if val.trader is not None:
-                    val.trader.cash -= tmp_price * tmp_qty * (1 + t_cost)
-                    val.trader.assets += tmp_qty
+            if side == 1:
+                if trader is not None:
+                    trader.cash -= tmp_price * tmp_qty * (1 + t_cost)
+                    trader.assets += tmp_qty
+                if maker is not None:
+                    maker.cash += tmp_price * tmp_qty * (1 - t_cost)
+                    maker.assets -= tmp_qty
+            else:
+                if trader is not None:
+                    trader.cash += tmp_price * tmp_qty * (1 - t_cost)
+                    trader.assets -= tmp_qty
+                if maker is not None:
+                    maker.cash -= tmp_price * tmp_qty * (1 + t_cost)
+                    maker.assets += tmp_qty
+
+            if tape is not None:
+                tape.record(tmp_price, tmp_qty, side, maker.id if maker is not None else -1, taker)
 
             # Clear remaining
-            if val.qty == 0:
-                self.remove(val)
+            self._execute(h, tmp_qty)
+            h = nxt
 
+        order.qty = qty
         return order
 
+    def load(self, orders: list):
+        """
+        Bulk load orders already sorted best-offer -> worst-offer into empty list in one pass
+
+        complexity O(n)
+
+        :param orders: list[Order]
+        :return: void
+        """
+        if self.head != -1:
+            raise ValueError('Bulk load is only possible into empty OrderList')
+        if not orders:
+            return
+        if orders[0].order_type != self.order_type:
+            raise ValueError(f'Wrong order type! OrderList: {self.order_type}, Order: {orders[0].order_type}')
+
+        n = len(orders)
+        self.head = self.pool.load(orders, self._sign)
+        self.tail = self.head + n - 1
+
+        prices = self.pool.price[self.head:self.tail + 1]
+        qtys = self.pool.qty[self.head:self.tail + 1]
+        self.version += 1
+        self.count = n
+        self.volume = sum(qtys)
+        self.volume_sq = sum([q * q for q in qtys])
+        self.price_sum = sum(prices)
+        self.price_sq = sum([p * p for p in prices])
+
+    def depth(self, n_levels: int = None) -> tuple:
+        """
+        Aggregated price levels from best-offer to worst-offer, walks orders of first n_levels only
+
+        :param n_levels: number of price levels, all levels if None
+        :return: (list[float] price, list[int] total qty, list[int] number of orders)
+        """
+        price, qty, right = self.pool.price, self.pool.qty, self.pool.right
+        prices, qtys, counts = list(), list(), list()
+        h = self.head
+        while h != -1:
+            if not prices or price[h] != prices[-1]:
+                if len(prices) == n_levels:
+                    break
+                prices.append(price[h])
+                qtys.append(0)
+                counts.append(0)
+            qtys[-1] += qty[h]
+            counts[-1] += 1
+            h = right[h]
+        return prices, qtys, counts
+
+    def execute(self, order: Order, qty: int):
+        """
+        Decrease quantity of order in list by executed qty, order is removed when fully executed.
+        Cash and assets are not settled.
+
+        :param order: Order
+        :param qty: quantity executed
+        :return: void
+        """
+        h = self._handle(order)
+        if h == -1:
+            raise ValueError(f'Order {order.order_id} is not in OrderList')
+        self._execute(h, qty)
+
+    def _execute(self, h: int, qty: int):
+        qtys = self.pool.qty
+        left = qtys[h]
+        self.version += 1
+        self.volume -= qty
+        self.volume_sq -= qty * (2 * left - qty)  # (q - qty)^2 - q^2
+        qtys[h] = left - qty
+        if left == qty:
+            self._remove(h)
+
     @classmethod
     def from_list(cls, order_list, sort=False):
         order_list = [Order(order['price'], order['qty'], order['order_type'],
                             order.get('trader_link')) for order in order_list]
-        order_list_obj = OrderList(order_list[0].order_type)
+        order_list_obj = cls(order_list[0].order_type)
         if sort:
             for order in order_list:
                 order_list_obj.insert(order)
@@ -267,3 +808,248 @@ class OrderList:
             for order in order_list:
                 order_list_obj.append(order)
         return order_list_obj
+
+
+class PriceLevel:
+    """
+    PriceLevel holds FIFO queue of orders with the same price. Orders of the level are stored as a contiguous
+    segment of the doubly linked list of LevelOrderList: from first (oldest) to last (newest) handle.
+    """
+    __slots__ = ('price', 'first', 'last', 'count', 'qty')
+
+    def __init__(self, price):
+        self.price = price
+        self.first = -1
+        self.last = -1
+        self.count = 0  # number of orders
+        self.qty = 0  # total quantity of orders
+
+    def __repr__(self) -> str:
+        return f'level (price={self.price}, qty={self.qty}, count={self.count})'
+
+
+class LevelOrderList(OrderList):
+    """
+    LevelOrderList is implemented as a doubly linked list of orders indexed by sorted price levels.
+    Each price level is a FIFO queue, so orders are executed with strict price-time priority:
+    best price first, earliest order first within the same price.
+
+    first, last, push: complexity O(1)
+
+    insert, append, remove: complexity O(1) within existing price level. New level is found by bisection
+    in O(log L), where L is the number of price levels, but adding it to (or dropping other than the best
+    level from) the sorted list of level keys shifts the list, O(L)
+
+    fulfill: complexity O(k), where k is the number of orders executed
+    """
+    def __init__(self, order_type: str, pool: OrderPool = None):
+        super().__init__(order_type, pool)
+        self.levels = dict()  # price -> PriceLevel
+        self.keys = list()  # sorted level keys, worst-offer -> best-offer
+
+    def _add_level(self, price, idx: int = None) -> PriceLevel:
+        key = self._sign * price
+        if idx is None:
+            idx = bisect_left(self.keys, key)
+        self.keys.insert(idx, key)
+        level = PriceLevel(price)
+        self.levels[price] = level
+        return level
+
+    def _drop_level(self, level: PriceLevel):
+        key = self._sign * level.price
+        if self.keys[-1] == key:  # best level is removed most of the time
+            self.keys.pop()
+        else:
+            del self.keys[bisect_left(self.keys, key)]
+        del self.levels[level.price]
+
+    @staticmethod
+    def _queue(level: PriceLevel, h: int, qty: int):
+        """
+        Account order of qty linked as the last one of level
+        """
+        if level.first == -1:
+            level.first = h
+        level.last = h
+        level.count += 1
+        level.qty += qty
+
+    def load(self, orders: list):
+        """
+        Bulk load orders already sorted best-offer -> worst-offer into empty list in one pass,
+        price levels are built along the way
+
+        complexity O(n)
+
+        :param orders: list[Order]
+        :return: void
+        """
+        super().load(orders)
+        if self.head == -1:
+            return
+        prices = self.pool.price[self.head:self.tail + 1]
+        qtys = self.pool.qty[self.head:self.tail + 1]
+        level = None
+        for h, price, qty in zip(range(self.head, self.tail + 1), prices, qtys):
+            if level is None or price != level.price:
+                level = PriceLevel(price)
+                level.first = h
+                self.levels[price] = level
+                self.keys.append(self._sign * price)
+            level.last = h
+            level.count += 1
+            level.qty += qty
+        self.keys.reverse()  # worst-offer -> best-offer
+
+    def depth(self, n_levels: int = None) -> tuple:
+        """
+        Aggregated price levels from best-offer to worst-offer, complexity O(n_levels)
+
+        :param n_levels: number of price levels, all levels if None
+        :return: (list[float] price, list[int] total qty, list[int] number of orders)
+        """
+        keys = self.keys[::-1] if n_levels is None else self.keys[:-n_levels-1:-1]
+        levels = [self.levels[self._sign * key] for key in keys]
+        return [lvl.price for lvl in levels], [lvl.qty for lvl in levels], [lvl.count for lvl in levels]
+
+    def _execute(self, h: int, qty: int):
+        self.levels[self.pool.price[h]].qty -= qty
+        super()._execute(h, qty)
+
+    def _link_after(self, prev: int, h: int):
+        left, right = self.pool.left, self.pool.right
+        nxt = right[prev]
+        left[h] = prev
+        right[h] = nxt
+        if nxt != -1:
+            left[nxt] = h
+        else:
+            self.tail = h
+        right[prev] = h
+
+    def _remove(self, h: int):
+        pool = self.pool
+        level = self.levels[pool.price[h]]
+        if level.count == 1:
+            self._drop_level(level)
+        else:
+            if h == level.first:
+                level.first = pool.right[h]
+            if h == level.last:
+                level.last = pool.left[h]
+            level.count -= 1
+            level.qty -= pool.qty[h]
+        super()._remove(h)
+
+    def append(self, order: Order):
+        """
+        Insert order in the end, order price should be not better than the worst price in book
+
+        :param order: Order
+        :return: void
+        """
+        h = self._add(order)
+        self._append(h)
+        price = order.price
+        level = self.levels.get(price)
+        if level is None:
+            level = self._add_level(price, 0)
+        self._queue(level, h, order._qty)
+
+    def push(self, order: Order):
+        """
+        Insert order in the beginning, order price should be not worse than the best price in book
+
+        :param order: Order
+        :return: void
+        """
+        h = self._add(order)
+        price = order.price
+        level = self.levels.get(price)
+        if level is not None:
+            # Same price as best level -> preserve time priority
+            self._link_after(level.last, h)
+        else:
+            self._push(h)
+            level = self._add_level(price, len(self.keys))
+        self._queue(level, h, order._qty)
+
+    def insert(self, order: Order):
+        """
+        Inserts order preserving best-offer -> worst-offer and time priority within price level
+
+        :param order: Order
+        :return: void
+        """
+        h = self._add(order)
+        price = order.price
+
+        # Existing price level -> queue at the end of the level
+        level = self.levels.get(price)
+        if level is not None:
+            self._link_after(level.last, h)
+            self._queue(level, h, order._qty)
+            return
+
+        # New price level -> link after the last order of the next better level
+        idx = bisect_left(self.keys, self._sign * price)
+        if idx == len(self.keys):
+            self._push(h)
+        else:
+            self._link_after(self.levels[self._sign * self.keys[idx]].last, h)
+        self._queue(self._add_level(price, idx), h, order._qty)
+
+
+class CountingOrders:
+    """
+    CountingOrders is a mixin of order list that counts operations: orders inserted, nodes walked in
+    insert and fulfill, fills and cancels of resting orders. Profiler switches class of order lists of
+    exchange to counting one for profiled run and back (see ExchangeAgent.count_operations), so that
+    lists are not instrumented otherwise.
+    """
+    def _register(self, order: Order):
+        self.n_inserted += 1
+        super()._register(order)
+
+    def _find(self, order: Order) -> int:
+        price, right = self.pool.price, self.pool.right
+        sign = self._sign
+        key = sign * order.price
+        walked = 0
+        h = self.head
+        while h != -1:
+            walked += 1
+            if key >= sign * price[h]:
+                break
+            h = right[h]
+        self.n_walked += walked
+        return h
+
+    def fulfill(self, order: Order, t_cost: float) -> Order:
+        filled = self.n_filled
+        order = super().fulfill(order, t_cost)
+        # Each fill walks a node, and the node that stopped matching by price too
+        self.n_walked += self.n_filled - filled + (1 if order.qty and self.head != -1 else 0)
+        return order
+
+    def _execute(self, h: int, qty: int):
+        self.n_filled += 1
+        super()._execute(h, qty)
+
+    def _remove(self, h: int):
+        if self.pool.qty[h]:  # executed orders are removed with qty 0
+            self.n_cancelled += 1
+        super()._remove(h)
+
+
+class CountingOrderList(CountingOrders, OrderList):
+    """
+    OrderList counting operations, see CountingOrders
+    """
+
+
+class CountingLevelOrderList(CountingOrders, LevelOrderList):
+    """
+    LevelOrderList counting operations, see CountingOrders
+    """
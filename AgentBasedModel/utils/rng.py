@@ -0,0 +1,95 @@
+import numpy as np
+import random
+
+
+class RandomStream:
+    """
+    RandomStream is an explicit random number generator of one simulation. Uniform, exponential and
+    normal variates are drawn by NumPy generator in blocks and consumed one by one from buffers.
+
+    It provides methods of random module (random, uniform, randint, randrange, expovariate,
+    normalvariate, shuffle), so that it can be passed wherever random module is used. NumPy generator
+    is available as generator for drawing arrays.
+
+    Streams are seeded by SeedSequence and can be spawned into independent child streams. If no seed
+    is given, seed is drawn from random module, so that seeding random module reproduces simulation.
+    """
+    def __init__(self, seed: int or np.random.SeedSequence = None, block: int = 1024):
+        """
+        :param seed: seed or SeedSequence of stream, drawn from random module if None
+        :param block: number of variates drawn at once
+        """
+        if seed is None:
+            seed = random.getrandbits(128)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.default_rng(seed)
+        self.block = block
+
+        self._uniform = list()
+        self._exponential = list()
+        self._normal = list()
+
+    def spawn(self, n: int) -> list:
+        """
+        :return: n independent child streams
+        """
+        return [RandomStream(seed, self.block) for seed in self.seed_sequence.spawn(n)]
+
+    def random(self) -> float:
+        """
+        :return: uniform variate from [0, 1)
+        """
+        try:
+            return self._uniform.pop()
+        except IndexError:
+            self._uniform = self.generator.random(self.block).tolist()
+            return self._uniform.pop()
+
+    def exponential(self) -> float:
+        """
+        :return: exponential variate with mean 1
+        """
+        try:
+            return self._exponential.pop()
+        except IndexError:
+            self._exponential = self.generator.standard_exponential(self.block).tolist()
+            return self._exponential.pop()
+
+    def normal(self) -> float:
+        """
+        :return: normal variate with mean 0 and standard deviation 1
+        """
+        try:
+            return self._normal.pop()
+        except IndexError:
+            self._normal = self.generator.standard_normal(self.block).tolist()
+            return self._normal.pop()
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def randint(self, a: int, b: int) -> int:
+        """
+        :return: integer from [a, b]
+        """
+        return a + int(self.random() * (b - a + 1))
+
+    def randrange(self, n: int) -> int:
+        """
+        :return: integer from [0, n)
+        """
+        return int(self.random() * n)
+
+    def expovariate(self, lambd: float) -> float:
+        return self.exponential() / lambd
+
+    def normalvariate(self, mu: float, sigma: float) -> float:
+        return mu + sigma * self.normal()
+
+    def shuffle(self, x: list):
+        """
+        Shuffle list in place
+        """
+        self.generator.shuffle(x)
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class TradeTape:
+    """
+    TradeTape records every executed trade (fill) in preallocated NumPy columns, no Python objects
+    are created per trade. Storage grows by doubling, or works as ring buffer keeping the latest
+    capacity trades if ring is set.
+
+    **Columns:**
+
+    - **iteration** --> iteration of the trade
+    - **price** --> traded price
+    - **qty** --> traded quantity
+    - **side** --> aggressor side: 1 - buy, -1 - sell, 0 - call auction
+    - **maker** --> trader id of resting order (seller in call auction), -1 if no trader
+    - **taker** --> trader id of incoming order (buyer in call auction), -1 if no trader
+    """
+    dtypes = {'iteration': np.int32, 'price': np.float64, 'qty': np.int64, 'side': np.int8, 'maker': np.int64,
+              'taker': np.int64}
+
+    def __init__(self, capacity: int = 2**14, ring: bool = False):
+        """
+        :param capacity: number of trades preallocated
+        :param ring: if True keep only last capacity trades, otherwise grow storage when full
+        """
+        self.capacity = capacity
+        self.ring = ring
+        self.iteration = 0  # current iteration, set by simulator
+        self.total = 0  # number of trades recorded
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.dtypes.items()}
+        self._iteration = self._columns['iteration']
+        self._price = self._columns['price']
+        self._qty = self._columns['qty']
+        self._side = self._columns['side']
+        self._maker = self._columns['maker']
+        self._taker = self._columns['taker']
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        :return: column of stored trades from oldest to newest
+        """
+        column = self._columns[name]
+        n = len(self)
+        if self.ring and self.total > self.capacity:
+            i = self.total % self.capacity
+            return np.concatenate([column[i:], column[:i]])
+        return column[:n]
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, np.zeros_like(column)])
+        self._iteration = self._columns['iteration']
+        self._price = self._columns['price']
+        self._qty = self._columns['qty']
+        self._side = self._columns['side']
+        self._maker = self._columns['maker']
+        self._taker = self._columns['taker']
+
+    def record(self, price: float, qty: int, side: int, maker: int, taker: int):
+        """
+        Record one trade at current iteration
+
+        :return: void
+        """
+        i = self.total
+        if i >= self.capacity:
+            if self.ring:
+                i %= self.capacity
+            else:
+                self._grow()
+        self._iteration[i] = self.iteration
+        self._price[i] = price
+        self._qty[i] = qty
+        self._side[i] = side
+        self._maker[i] = maker
+        self._taker[i] = taker
+        self.total += 1
+
+    def to_dict(self) -> dict:
+        """
+        :return: {column name: ndarray} of stored trades from oldest to newest
+        """
+        return {name: self[name] for name in self.dtypes}
+
+    def volume(self, n_iter: int = None) -> np.ndarray:
+        """
+        :return: traded quantity at each iteration
+        """
+        return np.bincount(self['iteration'], weights=self['qty'], minlength=n_iter or 0)
+
+    def vwap(self, n_iter: int = None) -> np.ndarray:
+        """
+        :return: volume weighted average traded price at each iteration, nan if no trades
+        """
+        value = np.bincount(self['iteration'], weights=self['price'] * self['qty'], minlength=n_iter or 0)
+        volume = self.volume(n_iter)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return value / volume
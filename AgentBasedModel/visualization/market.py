@@ -8,7 +8,7 @@ def plot_price(info: SimulatorInfo, spread=False, rolling: int = 1, figsize=(6,
     plt.title('Stock Price') if rolling == 1 else plt.title(f'Stock Price (MA {rolling})')
     plt.xlabel('Iterations')
     plt.ylabel('Price')
-    plt.plot(range(rolling, len(info.prices)), math.rolling(info.prices, rolling), color='black')
+    plt.plot(range(rolling, len(info.prices)), info.rolling_mean('prices', rolling), color='black')
     if spread:
         v1 = [el['bid'] for el in info.spreads]
         v2 = [el['ask'] for el in info.spreads]
@@ -30,8 +30,9 @@ def plot_price_fundamental(info: SimulatorInfo, spread=False, access: int = 1, r
         v2 = [el['ask'] for el in info.spreads]
         plt.plot(range(rolling, len(v1)), math.rolling(v1, rolling), label='bid', color='green')
         plt.plot(range(rolling, len(v2)), math.rolling(v2, rolling), label='ask', color='red')
-    plt.plot(range(rolling, len(info.prices)), math.rolling(info.prices, rolling), label='market value', color='black')
-    plt.plot(range(rolling, len(info.prices)), math.rolling(info.fundamental_value(access), rolling),
+    plt.plot(range(rolling, len(info.prices)), info.rolling_mean('prices', rolling), label='market value',
+             color='black')
+    plt.plot(range(rolling, len(info.prices)), info.rolling_mean('fundamental_value', rolling, access),
              label='fundamental value')
     plt.legend()
     plt.show()
@@ -57,7 +58,7 @@ def plot_dividend(info: SimulatorInfo, rolling: int = 1, figsize=(6, 6)):
     plt.title('Stock Dividend') if rolling == 1 else plt.title(f'Stock Dividend (MA {rolling})')
     plt.xlabel('Iterations')
     plt.ylabel('Dividend')
-    plt.plot(range(rolling, len(info.dividends)), math.rolling(info.dividends, rolling), color='black')
+    plt.plot(range(rolling, len(info.dividends)), info.rolling_mean('dividends', rolling), color='black')
     plt.show()
 
 
@@ -0,0 +1,11 @@
+"""
+Benchmark suite of order book, exchange, info capture, state classification and full simulations.
+
+Run from repository root:
+
+    python -m benchmarks run [--quick] [-k PATTERN] [-o results.json]
+    python -m benchmarks compare base.json new.json [-t 0.1]
+
+Results are JSON files with environment metadata and samples of each case, compare exits with code 1
+if any case is slower than base by more than threshold.
+"""
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+
+from benchmarks import harness
+import benchmarks.cases  # registers benchmarks
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='AgentBasedModel benchmark suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run benchmarks and save results as JSON')
+    run.add_argument('-o', '--output', help='results file, benchmarks/results/<commit>.json by default')
+    run.add_argument('-k', '--pattern', help='run only cases with id matching regular expression')
+    run.add_argument('-r', '--repeat', type=int, default=3, help='samples of each case')
+    run.add_argument('--quick', action='store_true', help='run reduced parameter grids (small books and populations)')
+
+    compare = commands.add_parser('compare', help='compare two results files')
+    compare.add_argument('base', help='results of reference version')
+    compare.add_argument('new', help='results of compared version')
+    compare.add_argument('-t', '--threshold', type=float, default=.1, help='relative slowdown counted as regression')
+    compare.add_argument('-s', '--stat', choices=['min', 'median', 'mean'], default='median')
+
+    cases = commands.add_parser('list', help='list benchmark cases')
+    cases.add_argument('--quick', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for bench in harness.Benchmark.registry.values():
+            for case_id, kwargs in bench.cases(args.quick):
+                print(case_id)
+        return 0
+
+    if args.command == 'run':
+        report = harness.run(args.pattern, args.quick, args.repeat)
+        path = args.output
+        if path is None:
+            path = os.path.join(os.path.dirname(__file__), 'results', f'{report["meta"]["commit"] or "local"}.json')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        harness.save(report, path)
+        print(f'Saved {len(report["results"])} results to {path}')
+        return 0
+
+    base, new = harness.load(args.base), harness.load(args.new)
+    rows, regressions = harness.compare(base, new, args.threshold, args.stat)
+    print(f'base: {base["meta"]["commit"]} ({base["meta"]["created"]}), '
+          f'new: {new["meta"]["commit"]} ({new["meta"]["created"]})')
+    units = {case_id: result['unit'] for report in (base, new) for case_id, result in report['results'].items()}
+    print(harness.table(rows, units))
+    if regressions:
+        print(f'{len(regressions)} regressions slower by more than {args.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
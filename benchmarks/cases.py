@@ -0,0 +1,181 @@
+from time import perf_counter
+import tracemalloc
+
+import numpy as np
+
+from AgentBasedModel.agents import ExchangeAgent, Random, Fundamentalist, Chartist, Universalist
+from AgentBasedModel.events import MarketMakerIn
+from AgentBasedModel.simulator import Simulator
+from AgentBasedModel.science import general_states as _general_states
+from AgentBasedModel.utils import Order
+from benchmarks.harness import benchmark
+
+SEED = 0  # workloads are identical across runs and versions
+ENGINES = list(ExchangeAgent.books)
+ORDERS = [10**3, 10**4, 10**5, 10**6]  # resting orders in book
+TRADERS = [20, 200, 2000, 20000]
+MIXES = {
+    'random': [Random],
+    'fundamentalist': [Fundamentalist],
+    'chartist': [Chartist],
+    'universalist': [Universalist],
+    'mixed': [Random, Fundamentalist, Chartist, Universalist]
+}
+
+
+def _ops(engine: str, n: int) -> int:
+    """
+    :return: number of operations timed in one sample, fewer for linear engine on large books
+    """
+    if engine == 'list':
+        return max(10, min(200, 2 * 10**6 // n))
+    return 200
+
+
+def _book(engine: str, n: int, rng: np.random.Generator):
+    """
+    :return: bid side of n resting orders, prices ~ N(100, 25)
+    """
+    prices = np.sort(np.round(rng.normal(100, 25, n), 1))[::-1]  # best-offer -> worst-offer
+    quantities = rng.integers(1, 11, n)
+    book = ExchangeAgent.books[engine]('bid')
+    book.load([Order(p, q, 'bid', None) for p, q in zip(prices.tolist(), quantities.tolist())])
+    return book
+
+
+def _traders(exchange: ExchangeAgent, mix: str, n: int) -> list:
+    classes = MIXES[mix]
+    return [classes[i % len(classes)](exchange, 10**3) for i in range(n)]
+
+
+# Order book
+@benchmark('orderlist.insert', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]})
+def insert(engine: str, n: int) -> float:
+    rng = np.random.default_rng(SEED)
+    book = _book(engine, n, rng)
+    prices = np.round(rng.normal(100, 25, _ops(engine, n)), 1).tolist()
+    orders = [Order(p, 5, 'bid', None) for p in prices]
+
+    t = perf_counter()
+    for order in orders:
+        book.insert(order)
+    return (perf_counter() - t) / len(orders)
+
+
+@benchmark('orderlist.fulfill', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]})
+def fulfill(engine: str, n: int) -> float:
+    rng = np.random.default_rng(SEED)
+    book = _book(engine, n, rng)
+    quantities = rng.integers(1, 11, _ops(engine, n)).tolist()
+    orders = [Order(book.last.price, q, 'ask', None) for q in quantities]  # market orders
+
+    t = perf_counter()
+    for order in orders:
+        book.fulfill(order, 0)
+    return (perf_counter() - t) / len(orders)
+
+
+@benchmark('orderlist.remove', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]})
+def remove(engine: str, n: int) -> float:
+    rng = np.random.default_rng(SEED)
+    book = _book(engine, n, rng)
+    resting = list(book)
+    orders = [resting[i] for i in rng.choice(n, _ops(engine, n), replace=False).tolist()]
+
+    t = perf_counter()
+    for order in orders:
+        book.remove(order)
+    return (perf_counter() - t) / len(orders)
+
+
+@benchmark('orderlist.memory', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]}, unit='B/order')
+def memory(engine: str, n: int) -> float:
+    rng = np.random.default_rng(SEED)
+    prices = np.sort(np.round(rng.normal(100, 25, n), 1))[::-1].tolist()
+    quantities = rng.integers(1, 11, n).tolist()
+
+    tracemalloc.start()
+    book = ExchangeAgent.books[engine]('bid')
+    orders = [Order(p, q, 'bid', None) for p, q in zip(prices, quantities)]
+    book.load(orders)
+    del orders
+    size = tracemalloc.get_traced_memory()[0]  # pool rows, id runs and price levels of resting orders
+    tracemalloc.stop()
+    return size / n
+
+
+# Exchange
+@benchmark('exchange.limit_order', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]})
+def limit_order(engine: str, n: int) -> float:
+    exchange = ExchangeAgent(volume=n, book=engine, rng=SEED)
+    rng = np.random.default_rng(SEED)
+    k = _ops(engine, n)
+    sides = rng.choice(['bid', 'ask'], k).tolist()
+    prices = np.round(rng.normal(100, 10, k), 1).tolist()  # part of orders cross the spread
+    quantities = rng.integers(1, 11, k).tolist()
+    orders = [Order(p, q, s, None) for p, q, s in zip(prices, quantities, sides)]
+
+    t = perf_counter()
+    for order in orders:
+        exchange.limit_order(order)
+    return (perf_counter() - t) / len(orders)
+
+
+@benchmark('exchange.market_order', engine=ENGINES, n=ORDERS, quick={'engine': ENGINES, 'n': ORDERS[:2]})
+def market_order(engine: str, n: int) -> float:
+    exchange = ExchangeAgent(volume=n, book=engine, rng=SEED)
+    rng = np.random.default_rng(SEED)
+    k = _ops(engine, n)
+    sides = rng.choice(['bid', 'ask'], k).tolist()
+    quantities = rng.integers(1, 11, k).tolist()
+
+    elapsed = 0
+    for side, qty in zip(sides, quantities):
+        other = exchange.order_book['ask' if side == 'bid' else 'bid']
+        order = Order(other.last.price, qty, side, None)
+        t = perf_counter()
+        exchange.market_order(order)
+        elapsed += perf_counter() - t
+    return elapsed / k
+
+
+# Simulation
+@benchmark('info.capture', n=TRADERS, quick={'n': TRADERS[:2]})
+def capture(n: int) -> float:
+    exchange = ExchangeAgent(volume=1000, rng=SEED)
+    simulator = Simulator(exchange, _traders(exchange, 'mixed', n))
+    k = 20
+
+    t = perf_counter()
+    for _ in range(k):
+        simulator.info.capture()
+    return (perf_counter() - t) / k
+
+
+_histories = dict()  # n_iter -> SimulatorInfo, simulated once per process
+
+
+@benchmark('science.general_states', n_iter=[200, 1000], quick={'n_iter': [200]}, unit='s/call')
+def general_states(n_iter: int) -> float:
+    if n_iter not in _histories:
+        exchange = ExchangeAgent(volume=1000, rng=SEED)
+        simulator = Simulator(exchange, _traders(exchange, 'mixed', 20), [MarketMakerIn(0)])
+        _histories[n_iter] = simulator.simulate(n_iter, silent=True).info
+    info = _histories[n_iter]
+    info._cache.clear()  # derived series are memoized by info, each sample computes them
+
+    t = perf_counter()
+    _general_states(info, size=10)
+    return perf_counter() - t
+
+
+@benchmark('simulator.simulate', mix=list(MIXES), n=TRADERS, quick={'mix': list(MIXES), 'n': TRADERS[:2]},
+           unit='s/it')
+def simulate(mix: str, n: int) -> float:
+    exchange = ExchangeAgent(volume=1000, rng=SEED)
+    simulator = Simulator(exchange, _traders(exchange, mix, n), [MarketMakerIn(0)])
+    n_iter = max(5, min(100, 20000 // n))
+
+    t = perf_counter()
+    simulator.simulate(n_iter, silent=True)
+    return (perf_counter() - t) / max(simulator.iteration, 1)
@@ -0,0 +1,180 @@
+from itertools import product
+from datetime import datetime, timezone
+from statistics import median
+import subprocess
+import platform
+import json
+import re
+
+import numpy as np
+
+
+class Benchmark:
+    """
+    Benchmark is a named case run at every combination of its parameters. Case function receives
+    parameters as keyword arguments and returns seconds per operation measured once, the harness calls
+    it repeat times and keeps all samples.
+    """
+    registry = dict()  # name -> Benchmark, in order of registration
+
+    def __init__(self, name: str, func, params: dict, quick: dict = None, unit: str = 's/op'):
+        """
+        :param name: group name, e.g. 'orderlist.insert'
+        :param func: case function of parameters returning seconds per operation
+        :param params: parameter -> list of values
+        :param quick: parameter -> list of values used in quick mode, params if None
+        :param unit: unit of samples
+        """
+        self.name = name
+        self.func = func
+        self.params = params
+        self.quick = quick if quick is not None else params
+        self.unit = unit
+
+    def cases(self, quick: bool = False) -> list:
+        """
+        :return: list of (case id, parameters)
+        """
+        params = self.quick if quick else self.params
+        res = list()
+        for values in product(*params.values()):
+            kwargs = dict(zip(params.keys(), values))
+            res.append((f'{self.name}[{",".join(str(v) for v in values)}]', kwargs))
+        return res
+
+
+def benchmark(name: str, quick: dict = None, unit: str = 's/op', **params):
+    """
+    Register decorated function as Benchmark
+
+    :param name: group name
+    :param quick: parameter -> list of values used in quick mode
+    :param unit: unit of samples
+    :param params: parameter -> list of values
+    """
+    def decorator(func):
+        Benchmark.registry[name] = Benchmark(name, func, params, quick, unit)
+        return func
+    return decorator
+
+
+def _commit() -> str or None:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def metadata(quick: bool, repeat: int) -> dict:
+    """
+    :return: environment results were measured in
+    """
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'quick': quick,
+        'repeat': repeat
+    }
+
+
+def run(pattern: str = None, quick: bool = False, repeat: int = 3, log=print) -> dict:
+    """
+    Run registered benchmarks
+
+    :param pattern: regular expression, only cases with matching id are run
+    :param quick: run reduced parameter grids
+    :param repeat: number of samples of each case
+    :param log: function of line, called with result of each case
+    :return: {'meta': metadata, 'results': {case id: result}}
+    """
+    results = dict()
+    for bench in Benchmark.registry.values():
+        for case_id, kwargs in bench.cases(quick):
+            if pattern is not None and not re.search(pattern, case_id):
+                continue
+            samples = [bench.func(**kwargs) for _ in range(repeat)]
+            results[case_id] = {
+                'group': bench.name,
+                'params': kwargs,
+                'unit': bench.unit,
+                'samples': samples,
+                'min': min(samples),
+                'median': median(samples),
+                'mean': sum(samples) / len(samples)
+            }
+            log(f'{case_id:<50}{_format(results[case_id]["median"], bench.unit):>14}')
+    return {'meta': metadata(quick, repeat), 'results': results}
+
+
+def save(report: dict, path: str):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=1)
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(base: dict, new: dict, threshold: float = .1, stat: str = 'median') -> tuple:
+    """
+    Compare two benchmark reports case by case
+
+    :param base: report of reference version
+    :param new: report of compared version
+    :param threshold: relative change of stat counted as regression (slower) or improvement (faster)
+    :param stat: statistic of samples compared, 'min', 'median' or 'mean'
+    :return: (rows, regressions), row: (case id, base value, new value, new / base, status)
+    """
+    rows, regressions = list(), list()
+    for case_id in list(base['results']) + [c for c in new['results'] if c not in base['results']]:
+        old = base['results'].get(case_id)
+        cur = new['results'].get(case_id)
+        if old is None or cur is None:
+            rows.append((case_id, old and old[stat], cur and cur[stat], None, 'missing'))
+            continue
+        ratio = cur[stat] / old[stat] if old[stat] else float('inf')
+        if ratio > 1 + threshold:
+            status = 'slower'
+            regressions.append(case_id)
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = ''
+        rows.append((case_id, old[stat], cur[stat], ratio, status))
+    return rows, regressions
+
+
+def _format(value: float or None, unit: str = 's') -> str:
+    """
+    :param unit: unit of value, times ('s', 's/op', 's/it', ...) are scaled to ms, us, ns
+    """
+    if value is None:
+        return '-'
+    if unit.split('/')[0] != 's':
+        return f'{value:.4g}{unit}'
+    per = unit[1:]
+    for scale, suffix in ((1, 's'), (1e-3, 'ms'), (1e-6, 'us')):
+        if value >= scale:
+            return f'{value / scale:.3g}{suffix}{per}'
+    return f'{value * 1e9:.3g}ns{per}'
+
+
+def table(rows: list, units: dict = None) -> str:
+    """
+    :param rows: rows returned by compare
+    :param units: case id -> unit of samples, seconds if None
+    :return: comparison table
+    """
+    units = units if units is not None else dict()
+    lines = [f'{"case":<50}{"base":>14}{"new":>14}{"ratio":>10}  status']
+    for case_id, old, cur, ratio, status in rows:
+        unit = units.get(case_id, 's')
+        ratio = f'{ratio:.2f}x' if ratio is not None else '-'
+        lines.append(f'{case_id:<50}{_format(old, unit):>14}{_format(cur, unit):>14}{ratio:>10}  {status}')
+    return '\n'.join(lines)